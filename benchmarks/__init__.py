@@ -0,0 +1,12 @@
+"""Замеры страниц `posts` на сгенерированных наборах данных.
+
+Запуск из корня репозитория::
+
+    python -m benchmarks --sizes small,medium
+    python -m benchmarks --save        # записать новую базовую линию
+
+Каждый сценарий гоняется через тестовый клиент Django на наборе,
+построенном `posts.seed.Seeder`; в отчёт попадают p50/p95/p99 времени
+ответа, число запросов к БД и пик выделенной памяти, а рядом —
+отклонение от benchmarks/baseline.json.
+"""
@@ -0,0 +1,87 @@
+import argparse
+import os
+import sys
+
+import django
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Замеры страниц posts на сгенерированных данных.',
+    )
+    parser.add_argument(
+        '--sizes', default='small,medium',
+        help='Наборы данных через запятую: small, medium, large.',
+    )
+    parser.add_argument(
+        '--only', default='',
+        help='Сценарии через запятую (по умолчанию все).',
+    )
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--warm', action='store_true',
+        help='Не сбрасывать кеш между запросами.',
+    )
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument(
+        '--tolerance', type=float, default=0.25,
+        help='Допустимый рост времени и памяти относительно базовой линии.',
+    )
+    parser.add_argument(
+        '--save', action='store_true',
+        help='Записать результаты как новую базовую линию.',
+    )
+    parser.add_argument(
+        '--check', action='store_true',
+        help='Завершиться с ошибкой, если есть регрессии.',
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sys.path.insert(0, os.path.join(ROOT, 'yatube'))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    django.setup()
+
+    from django.test.utils import (
+        setup_databases, setup_test_environment, teardown_databases,
+    )
+
+    from . import runner, scenarios
+
+    baseline = runner.load_baseline(args.baseline)
+    only = [name for name in args.only.split(',') if name]
+    results = {}
+    setup_test_environment()
+    for size in args.sizes.split(','):
+        # Каждый набор — в свежей тестовой базе: рабочая не затрагивается.
+        databases = setup_databases(verbosity=0, interactive=False)
+        try:
+            scenarios.seed(size, args.seed)
+            context = scenarios.build_context()
+            results[size] = runner.run(
+                context, args.repeat, args.warm, only
+            )
+        finally:
+            teardown_databases(databases, verbosity=0)
+        print(runner.report(size, results[size], baseline), flush=True)
+
+    regressions = runner.compare(results, baseline, args.tolerance)
+    for size, name, metric, old, new in regressions:
+        print(f'РЕГРЕССИЯ {size}/{name}: {metric} {old} -> {new}')
+    if args.save:
+        runner.save_baseline(args.baseline, {**baseline, **results})
+        print(f'Базовая линия записана в {args.baseline}')
+    if args.check and regressions:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
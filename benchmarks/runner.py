@@ -0,0 +1,146 @@
+"""Прогон сценариев, сводка по замерам и сравнение с базовой линией."""
+import gc
+import json
+import time
+import tracemalloc
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .scenarios import SCENARIOS
+
+PERCENTILES = (50, 95, 99)
+# Метрики, рост которых сверх допуска считается регрессией.
+# Запросы к БД от железа не зависят, поэтому для них допуска нет.
+TOLERANT_METRICS = ('p50', 'p95', 'p99', 'peak_kib')
+EXACT_METRICS = ('queries',)
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[rank - 1]
+
+
+def request(client, scenario, context):
+    kwargs = scenario.kwargs(context) if scenario.kwargs else {}
+    url = reverse(scenario.url_name, kwargs=kwargs)
+    if scenario.data:
+        response = client.post(url, scenario.data(context))
+    else:
+        response = client.get(url)
+    if response.status_code >= 400:
+        raise RuntimeError(f'{url} ответил {response.status_code}')
+    return response
+
+
+def measure(scenario, context, repeat=50, warm=False):
+    """Замеряет сценарий repeat раз; без warm — на холодном кеше.
+
+    Память меряется отдельным прогоном под tracemalloc, чтобы
+    трассировка не искажала время ответа.
+    """
+    client = Client()
+    client.force_login(context['reader'])
+    # Разогрев: импорты, шаблоны и соединение не должны попасть в замер.
+    request(client, scenario, context)
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        if not warm:
+            cache.clear()
+        # Сборка мусора от прошлых итераций не должна попасть в замер.
+        gc.collect()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            request(client, scenario, context)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries = max(queries, len(captured))
+    if not warm:
+        cache.clear()
+    tracemalloc.start()
+    try:
+        request(client, scenario, context)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    result = {
+        f'p{percent}': round(percentile(timings, percent), 2)
+        for percent in PERCENTILES
+    }
+    result['queries'] = queries
+    result['peak_kib'] = round(peak / 1024, 1)
+    return result
+
+
+def run(context, repeat=50, warm=False, only=None):
+    return {
+        scenario.name: measure(scenario, context, repeat, warm)
+        for scenario in SCENARIOS
+        if not only or scenario.name in only
+    }
+
+
+def load_baseline(path):
+    try:
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, results):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+        file.write('\n')
+
+
+def compare(results, baseline, tolerance=0.25):
+    """Список регрессий: (набор, сценарий, метрика, было, стало)."""
+    regressions = []
+    for size, scenarios in results.items():
+        for name, metrics in scenarios.items():
+            old = baseline.get(size, {}).get(name)
+            if not old:
+                continue
+            for metric in TOLERANT_METRICS + EXACT_METRICS:
+                if metric not in old:
+                    continue
+                limit = old[metric]
+                if metric in TOLERANT_METRICS:
+                    limit *= 1 + tolerance
+                if metrics[metric] > limit:
+                    regressions.append(
+                        (size, name, metric, old[metric], metrics[metric])
+                    )
+    return regressions
+
+
+def delta(new, old):
+    if not old:
+        return ''
+    return f'{(new - old) / old * 100:+.0f}%'
+
+
+def report(size, results, baseline):
+    """Таблица замеров набора; в скобках — отличие от базовой линии."""
+    columns = ('p50', 'p95', 'p99', 'queries', 'peak_kib')
+    lines = [
+        f'== {size} ==',
+        f'{"сценарий":<14}' + ''.join(f'{column:>18}' for column in columns),
+    ]
+    for name, metrics in results.items():
+        old = baseline.get(size, {}).get(name, {})
+        cells = []
+        for column in columns:
+            change = delta(metrics[column], old.get(column))
+            cell = f'{metrics[column]}'
+            if change:
+                cell += f' ({change})'
+            cells.append(f'{cell:>18}')
+        lines.append(f'{name:<14}' + ''.join(cells))
+    return '\n'.join(lines)
@@ -0,0 +1,72 @@
+"""Сценарии замеров и подготовка набора данных под них."""
+from collections import namedtuple
+
+from django.contrib.auth import get_user_model
+from django.db.models import Sum
+
+from posts.models import Follow, Group, Post, UserStats
+from posts.seed import Seeder
+
+User = get_user_model()
+
+# Размеры наборов: параметры posts.seed.Seeder.
+SIZES = {
+    'small': {'users': 100, 'posts': 1000, 'groups': 10},
+    'medium': {'users': 1000, 'posts': 10000, 'groups': 30},
+    'large': {'users': 5000, 'posts': 50000, 'groups': 50},
+}
+
+Scenario = namedtuple('Scenario', ['name', 'url_name', 'kwargs', 'data'])
+Scenario.__new__.__defaults__ = (None, None)
+
+
+def author(context):
+    return {'username': context['author'].username}
+
+
+def post_id(context):
+    return {'post_id': context['post'].pk}
+
+
+def new_post(context):
+    return {'text': 'Пост из замера', 'group': context['group'].pk}
+
+
+def new_comment(context):
+    return {'text': 'Комментарий из замера'}
+
+
+# data задана — сценарий отправляет POST, иначе GET.
+SCENARIOS = [
+    Scenario('index', 'posts:index'),
+    Scenario(
+        'group_posts', 'posts:group_list',
+        kwargs=lambda context: {'slug': context['group'].slug},
+    ),
+    Scenario('profile', 'posts:profile', kwargs=author),
+    Scenario('post_detail', 'posts:post_detail', kwargs=post_id),
+    Scenario('follow_index', 'posts:follow_index'),
+    Scenario('post_create', 'posts:create', data=new_post),
+    Scenario(
+        'add_comment', 'posts:add_comment', kwargs=post_id, data=new_comment
+    ),
+]
+
+
+def seed(size, seed=0):
+    Seeder(seed=seed, **SIZES[size]).run()
+
+
+def build_context():
+    """Самые тяжёлые объекты набора: на них страницы больше всего весят."""
+    top_author = UserStats.objects.order_by('-posts_count').first()
+    # Читатель, чья лента собирается из самых плодовитых авторов.
+    reader = Follow.objects.values('user').annotate(
+        posts=Sum('author__stats__posts_count')
+    ).order_by('-posts').first()
+    return {
+        'author': User.objects.get(pk=top_author.user_id),
+        'reader': User.objects.get(pk=reader['user']),
+        'group': Group.objects.order_by('-posts_count').first(),
+        'post': Post.objects.order_by('-comments_count', '-pk').first(),
+    }
@@ -0,0 +1,52 @@
+"""Бюджеты страниц `posts/urls.py`: запросы к БД и время ответа.
+
+Замер идёт на холодном кеше по данным фикстуры `budget_data`
+(см. tests/fixtures/fixture_budgets.py): лишний запрос на каждый пост
+или комментарий сразу выводит страницу за бюджет. Для форм с `data`
+меряется отправка валидной формы — POST, а не показ пустой.
+"""
+from collections import namedtuple
+
+Budget = namedtuple('Budget', ['queries', 'ms', 'kwargs', 'query', 'data'])
+Budget.__new__.__defaults__ = (None, '', None)
+
+
+def post_id(data):
+    return {'post_id': data['post'].pk}
+
+
+def author(data):
+    return {'username': data['author'].username}
+
+
+BUDGETS = {
+    'posts:index': Budget(queries=4, ms=400),
+    'posts:group_list': Budget(
+        queries=5, ms=400, kwargs=lambda data: {'slug': data['group'].slug}
+    ),
+    'posts:profile': Budget(queries=6, ms=400, kwargs=author),
+    'posts:post_detail': Budget(queries=5, ms=400, kwargs=post_id),
+    'posts:comments': Budget(queries=2, ms=300, kwargs=post_id),
+    'posts:edit': Budget(queries=4, ms=300, kwargs=post_id),
+    'posts:add_comment': Budget(
+        queries=5, ms=300, kwargs=post_id,
+        data=lambda data: {'text': 'Комментарий бюджета'},
+    ),
+    'posts:create': Budget(
+        queries=9, ms=300,
+        data=lambda data: {
+            'text': 'Новый пост бюджета', 'group': data['group'].pk
+        },
+    ),
+    'posts:follow_index': Budget(queries=6, ms=400),
+    'posts:search': Budget(queries=4, ms=400, query='q=пост'),
+    'posts:tag_list': Budget(
+        queries=4, ms=400, kwargs=lambda data: {'name': 'бюджет'}
+    ),
+    'posts:mentions': Budget(
+        queries=4, ms=400,
+        kwargs=lambda data: {'username': data['reader'].username},
+    ),
+    'posts:profile_follow': Budget(queries=4, ms=300, kwargs=author),
+    'posts:profile_unfollow': Budget(queries=10, ms=300, kwargs=author),
+}
@@ -0,0 +1,118 @@
+import time
+from collections import Counter
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.nplusone import shape
+from tests.budgets import BUDGETS
+
+POSTS = 30
+COMMENTS = 25
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        '--budget-time-factor', type=float, default=1.0,
+        help='Множитель бюджетов времени ответа (для медленных машин).',
+    )
+
+
+def describe_queries(queries):
+    """Пронумерованный список запросов с пометкой повторов (N+1)."""
+    repeats = Counter(shape(query['sql']) for query in queries)
+    lines = []
+    for number, query in enumerate(queries, 1):
+        count = repeats[shape(query['sql'])]
+        mark = f'  <- повторяется {count} раз' if count > 1 else ''
+        lines.append(f'{number:3}. {query["sql"]}{mark}')
+    return '\n'.join(lines)
+
+
+@pytest.fixture
+def budget_data(django_user_model, mixer):
+    """Данные, на которых меряются бюджеты: лента, комментарии, подписки."""
+    from posts.models import Comment, Follow, Group, Post
+
+    author = django_user_model.objects.create_user(username='BudgetAuthor')
+    reader = django_user_model.objects.create_user(username='BudgetReader')
+    others = mixer.cycle(3).blend(django_user_model)
+    group = Group.objects.create(
+        title='Группа бюджета', slug='budget', description='Замеры'
+    )
+    posts = [
+        Post.objects.create(
+            author=author if number % 2 else others[number % 3],
+            group=group,
+            text=f'Пост #бюджет номер {number} для @{reader.username}',
+        )
+        for number in range(POSTS)
+    ]
+    post = posts[-1]
+    for number in range(COMMENTS):
+        Comment.objects.create(
+            post=post, author=others[number % 3], text=f'Комментарий {number}'
+        )
+    Follow.objects.create(user=reader, author=author)
+    for other in others:
+        Follow.objects.create(user=reader, author=other)
+    return {
+        'author': author,
+        'reader': reader,
+        'group': group,
+        'post': post,
+    }
+
+
+@pytest.fixture
+def check_budget(client, budget_data, request):
+    """Запрашивает страницу по имени URL и сверяет её с бюджетом."""
+    time_factor = request.config.getoption('--budget-time-factor')
+    client.force_login(budget_data['reader'])
+
+    def check(url_name):
+        budget = BUDGETS[url_name]
+        kwargs = budget.kwargs(budget_data) if budget.kwargs else {}
+        url = reverse(url_name, kwargs=kwargs)
+        if budget.query:
+            url = f'{url}?{budget.query}'
+        data = budget.data(budget_data) if budget.data else None
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            if data is None:
+                response = client.get(url)
+            else:
+                response = client.post(url, data)
+            elapsed = (time.perf_counter() - started) * 1000
+        assert response.status_code < 400, (
+            f'Страница `{url}` ответила {response.status_code}'
+        )
+        # Невалидная форма вернулась бы с ошибками без единой записи.
+        assert data is None or response.status_code == 302, (
+            f'Форма `{url}` не принята: {response.status_code}'
+        )
+        # pytest.fail вместо assert: без разворачивания переменных
+        # сообщение остаётся читаемым списком запросов.
+        queries = context.captured_queries
+        if len(queries) > budget.queries:
+            pytest.fail(
+                f'`{url_name}` ({url}): {len(queries)} запросов к БД '
+                f'при бюджете {budget.queries}, '
+                f'лишних {len(queries) - budget.queries}:\n'
+                f'{describe_queries(queries)}',
+                pytrace=False,
+            )
+        ms = budget.ms * time_factor
+        if elapsed > ms:
+            pytest.fail(
+                f'`{url_name}` ({url}): ответ за {elapsed:.0f} мс '
+                f'при бюджете {ms:.0f} мс',
+                pytrace=False,
+            )
+        return response
+
+    return check
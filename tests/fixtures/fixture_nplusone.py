@@ -0,0 +1,15 @@
+import pytest
+
+
+@pytest.fixture
+def nplusone():
+    """Ловит N+1 во всём тесте: повторы одной формы SELECT валят его."""
+    from core.nplusone import Detector
+
+    detector = Detector()
+    with detector.watch():
+        yield detector
+    if detector.repeats():
+        pytest.fail(
+            f'Найдены N+1 запросы:\n{detector.report()}', pytrace=False
+        )
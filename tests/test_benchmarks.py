@@ -0,0 +1,30 @@
+import pytest
+
+from benchmarks import runner, scenarios
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert runner.percentile(values, 50) == 50
+    assert runner.percentile(values, 99) == 99
+    assert runner.percentile([7], 95) == 7
+
+
+def test_compare_flags_regressions():
+    baseline = {'small': {'index': {'p95': 10.0, 'queries': 4}}}
+    results = {'small': {'index': {'p95': 12.0, 'queries': 5}}}
+    assert runner.compare(results, baseline, tolerance=0.25) == [
+        ('small', 'index', 'queries', 4, 5),
+    ]
+
+
+@pytest.mark.django_db
+def test_every_scenario_runs():
+    scenarios.Seeder(users=10, posts=60, groups=2, follows=2).run()
+    results = runner.run(scenarios.build_context(), repeat=2)
+    assert set(results) == {
+        scenario.name for scenario in scenarios.SCENARIOS
+    }
+    for metrics in results.values():
+        assert metrics['queries'] > 0
+        assert metrics['p50'] <= metrics['p99']
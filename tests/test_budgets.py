@@ -0,0 +1,20 @@
+import pytest
+from django.urls import get_resolver
+
+from tests.budgets import BUDGETS
+
+pytestmark = [pytest.mark.django_db]
+
+
+def test_every_url_has_budget():
+    posts_urls = get_resolver().namespace_dict['posts'][1].url_patterns
+    names = {f'posts:{pattern.name}' for pattern in posts_urls}
+    assert names == set(BUDGETS), (
+        'Добавьте бюджеты для страниц '
+        f'{sorted(names - set(BUDGETS))} в tests/budgets.py'
+    )
+
+
+@pytest.mark.parametrize('url_name', sorted(BUDGETS))
+def test_view_within_budget(check_budget, url_name):
+    check_budget(url_name)
@@ -0,0 +1,12 @@
+import pytest
+
+from tests.budgets import BUDGETS
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.mark.parametrize('url_name', sorted(BUDGETS))
+def test_view_has_no_nplusone(check_budget, nplusone, url_name):
+    # Данные фикстуры созданы до начала слежки: ловятся только запросы
+    # самой страницы.
+    check_budget(url_name)
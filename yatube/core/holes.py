@@ -0,0 +1,48 @@
+"""Персональные вставки в страницы, общие для всех посетителей.
+
+Страница кешируется один раз для всех, а вместо зависящих от
+пользователя кусков в ней стоят маркеры. HolePunchMiddleware после
+выдачи из кеша дорисовывает каждый маркер для текущего запроса.
+"""
+import json
+import re
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.template.loader import render_to_string
+
+HOLE_RE = re.compile(r'<!--hole:(?P<name>[\w-]+):(?P<kwargs>[\w=-]*)-->')
+
+_registry = {}
+
+
+def register(name, template):
+    """Регистрирует вставку name.
+
+    Декорируемая функция получает request и аргументы маркера и
+    возвращает контекст для шаблона template.
+    """
+    def decorator(func):
+        _registry[name] = (template, func)
+        return func
+    return decorator
+
+
+def marker(name, **kwargs):
+    payload = urlsafe_b64encode(json.dumps(kwargs).encode()).decode()
+    return f'<!--hole:{name}:{payload}-->'
+
+
+def _render(request, match):
+    template, func = _registry[match.group('name')]
+    kwargs = json.loads(urlsafe_b64decode(match.group('kwargs')))
+    return render_to_string(template, func(request, **kwargs), request)
+
+
+def fill(request, content):
+    """Заменяет все маркеры в content отрисованными вставками."""
+    return HOLE_RE.sub(lambda match: _render(request, match), content)
+
+
+@register('header_nav', 'includes/header_nav.html')
+def header_nav(request):
+    return {}
@@ -0,0 +1,33 @@
+"""Общее для профилировщиков: выбор запросов по имени URL и имена мест."""
+import os
+import re
+
+from django.conf import settings
+from django.urls import Resolver404, resolve
+
+SAFE_NAME_RE = re.compile(r'[^\w.-]')
+
+
+def selected_url_name(request, names):
+    """Имя URL запроса, если оно есть в names, иначе None.
+
+    Вызывается до представления, поэтому адрес разрешается заново.
+    """
+    try:
+        match = resolve(request.path_info, getattr(request, 'urlconf', None))
+    except Resolver404:
+        return None
+    return match.view_name if match.view_name in names else None
+
+
+def short_path(filename):
+    """Путь от site-packages или от корня проекта — так короче в отчётах."""
+    for marker in ('site-packages' + os.sep, settings.BASE_DIR + os.sep):
+        if marker in filename:
+            return filename.split(marker, 1)[1]
+    return filename
+
+
+def file_name(url_name):
+    """Имя URL, пригодное для имени файла: posts:index -> posts-index."""
+    return SAFE_NAME_RE.sub('-', url_name)
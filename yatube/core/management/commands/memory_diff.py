@@ -0,0 +1,43 @@
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from core.introspection import short_path
+from core.memory import filtered
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает два снимка tracemalloc (например, снятые '
+        'MemoryProfileMiddleware в двух прогонах) и показывает, '
+        'где память выросла сильнее всего.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('old', help='Снимок первого прогона.')
+        parser.add_argument('new', help='Снимок второго прогона.')
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument(
+            '--group-by', default='lineno',
+            choices=('lineno', 'filename', 'traceback'),
+        )
+
+    def handle(self, *args, **options):
+        old = filtered(tracemalloc.Snapshot.load(options['old']))
+        new = filtered(tracemalloc.Snapshot.load(options['new']))
+        diff = new.compare_to(old, options['group_by'])
+        total = sum(stat.size_diff for stat in diff)
+        self.stdout.write(f'Всего: {total / 1024:+.1f} КиБ')
+        for stat in diff[:options['top']]:
+            frame = stat.traceback[0]
+            self.stdout.write(
+                f'{stat.size_diff / 1024:+9.1f} КиБ '
+                f'{stat.count_diff:+7} блоков  '
+                f'{short_path(frame.filename)}:{frame.lineno}'
+            )
+            if options['group_by'] == 'traceback':
+                for frame in list(stat.traceback)[1:]:
+                    self.stdout.write(
+                        f'{"":>32}{short_path(frame.filename)}:'
+                        f'{frame.lineno}'
+                    )
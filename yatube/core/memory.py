@@ -0,0 +1,83 @@
+"""Замеры памяти запросов через tracemalloc.
+
+Трассировка включается только на время выбранного запроса, и за раз
+меряется один запрос. Но tracemalloc общий на процесс и не различает
+потоки: всё, что другие потоки выделили за время замера, попадает
+в тот же снимок и в пик. Выделения профилировщика (core.profiling:
+поток записи и выборщик стеков) из снимка вычищаются; выделения
+параллельных запросов — нет, поэтому чистый замер получается на
+воркере, который обслуживает один запрос за раз. Снимок в конце
+запроса показывает то, что запрос оставил после себя, — именно это
+и копится в RSS воркера. Пик — максимум трассированной памяти.
+"""
+import os
+import threading
+import tracemalloc
+
+from django.conf import settings
+
+from core import profiling
+from core.introspection import file_name, short_path
+
+# Служебные выделения, которые не относятся к коду запроса; всё, что
+# прошло через core.profiling, выделено его потоками, а не запросом.
+FILTERS = (
+    tracemalloc.Filter(False, profiling.__file__, all_frames=True),
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+_lock = threading.Lock()
+
+
+def filtered(snapshot):
+    return snapshot.filter_traces(FILTERS)
+
+
+def top_sites(snapshot, limit):
+    """Места, где выделено больше всего оставшейся памяти."""
+    return [
+        (stat.size, stat.count, '{}:{}'.format(
+            short_path(stat.traceback[0].filename), stat.traceback[0].lineno
+        ))
+        for stat in snapshot.statistics('lineno')[:limit]
+    ]
+
+
+def snapshot_path(url_name):
+    return os.path.join(
+        settings.MEMORY_PROFILE_DIR,
+        f'{file_name(url_name)}.{os.getpid()}.snapshot',
+    )
+
+
+class Measurement:
+    def __init__(self, peak, snapshot):
+        self.peak = peak
+        self.snapshot = snapshot
+        self.retained = sum(
+            stat.size for stat in snapshot.statistics('filename')
+        )
+
+
+def measure(function, *args, **kwargs):
+    """Выполняет function под tracemalloc.
+
+    Возвращает (результат, Measurement) или (результат, None), если
+    трассировка уже занята другим запросом или кем-то снаружи.
+    """
+    if tracemalloc.is_tracing() or not _lock.acquire(blocking=False):
+        return function(*args, **kwargs), None
+    try:
+        tracemalloc.start(settings.MEMORY_PROFILE_FRAMES)
+        try:
+            result = function(*args, **kwargs)
+            snapshot = filtered(tracemalloc.take_snapshot())
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    finally:
+        _lock.release()
+    return result, Measurement(peak, snapshot)
@@ -0,0 +1,308 @@
+"""Метрики приложения в текстовом формате Prometheus.
+
+Каждый процесс (воркер WSGI, процесс нарезки превью) пишет свои значения
+в собственный файл METRICS_DIR/<pid>.db, отображённый в память: запись —
+это сложение числа на месте, без блокировок между процессами. Страница
+/metrics читает все файлы каталога и складывает одноимённые значения,
+поэтому показывает сумму по всем воркерам. Каталог очищается при деплое:
+иначе счётчики прошлого запуска продолжат суммироваться.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+
+# Число в начале файла — сколько байт занято записями.
+HEADER = struct.Struct('i')
+LENGTH = struct.Struct('i')
+VALUE = struct.Struct('d')
+INITIAL_SIZE = 64 * 1024
+
+REGISTRY = []
+
+
+def _padded(size):
+    return size + (-size) % 8
+
+
+class ValueFile:
+    """Словарь ключ -> число в файле: ключи дописываются, числа
+    правятся на месте."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'a+b')
+        if os.fstat(self.file.fileno()).st_size < INITIAL_SIZE:
+            self.file.truncate(INITIAL_SIZE)
+        self._map()
+        self.positions = {
+            key: position for key, _, position in read_entries(self.buffer)
+        }
+
+    def _map(self):
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.buffer = mmap.mmap(self.file.fileno(), self.size)
+        self.used = HEADER.unpack_from(self.buffer)[0] or HEADER.size
+        if self.used == HEADER.size:
+            HEADER.pack_into(self.buffer, 0, self.used)
+
+    def _add(self, key):
+        encoded = key.encode()
+        entry_size = _padded(LENGTH.size + len(encoded)) + VALUE.size
+        if self.used + entry_size > self.size:
+            self.buffer.close()
+            self.file.truncate(max(self.size * 2, self.used + entry_size))
+            self._map()
+        position = self.used
+        LENGTH.pack_into(self.buffer, position, len(encoded))
+        self.buffer[
+            position + LENGTH.size:position + LENGTH.size + len(encoded)
+        ] = encoded
+        value_position = position + entry_size - VALUE.size
+        VALUE.pack_into(self.buffer, value_position, 0.0)
+        # Размер обновляется последним: читатель не увидит
+        # недописанную запись.
+        self.used += entry_size
+        HEADER.pack_into(self.buffer, 0, self.used)
+        self.positions[key] = value_position
+        return value_position
+
+    def increment(self, key, amount):
+        position = self.positions.get(key)
+        if position is None:
+            position = self._add(key)
+        value = VALUE.unpack_from(self.buffer, position)[0]
+        VALUE.pack_into(self.buffer, position, value + amount)
+
+    def close(self):
+        self.buffer.close()
+        self.file.close()
+
+
+def read_entries(data):
+    """Записи файла: (ключ, значение, позиция значения)."""
+    if len(data) < HEADER.size:
+        return
+    used = HEADER.unpack_from(data)[0]
+    position = HEADER.size
+    while position < used:
+        length = LENGTH.unpack_from(data, position)[0]
+        start = position + LENGTH.size
+        key = bytes(data[start:start + length]).decode()
+        value_position = position + _padded(LENGTH.size + length)
+        yield key, VALUE.unpack_from(data, value_position)[0], value_position
+        position = value_position + VALUE.size
+
+
+class Storage:
+    """Файл значений текущего процесса; после fork открывается новый."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        self.values = None
+
+    def increment(self, key, amount):
+        with self.lock:
+            if self.pid != os.getpid():
+                os.makedirs(settings.METRICS_DIR, exist_ok=True)
+                self.pid = os.getpid()
+                self.values = ValueFile(
+                    os.path.join(settings.METRICS_DIR, f'{self.pid}.db')
+                )
+            self.values.increment(key, amount)
+
+    def reset(self):
+        with self.lock:
+            if self.values is not None:
+                self.values.close()
+            self.pid = self.values = None
+
+
+storage = Storage()
+
+
+def enabled():
+    return settings.METRICS_ENABLED
+
+
+def _key(name, labels, sample=''):
+    return json.dumps([name, sorted(labels.items()), sample])
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        REGISTRY.append(self)
+
+    def _check(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(
+                f'{self.name}: ожидались метки {self.labels}, '
+                f'получены {tuple(labels)}'
+            )
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if not enabled():
+            return
+        self._check(labels)
+        storage.increment(_key(self.name, labels), amount)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets, labels=()):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        if not enabled():
+            return
+        self._check(labels)
+        # Хранится попадание в одну корзину, накопленные суммы
+        # считаются при выдаче.
+        bucket = next(bound for bound in self.buckets if value <= bound)
+        storage.increment(_key(self.name, labels, f'bucket:{bucket}'), 1)
+        storage.increment(_key(self.name, labels, 'sum'), value)
+        storage.increment(_key(self.name, labels, 'count'), 1)
+
+
+REQUEST_SECONDS = Histogram(
+    'yatube_request_duration_seconds',
+    'Время ответа по имени URL.',
+    (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    labels=('url_name',),
+)
+REQUEST_QUERIES = Histogram(
+    'yatube_request_queries',
+    'Число запросов к БД на ответ по имени URL.',
+    (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+    labels=('url_name',),
+)
+CACHE_REQUESTS = Counter(
+    'yatube_cache_requests_total',
+    'Обращения к кешу страниц и карточек: попадания и промахи.',
+    labels=('cache', 'result'),
+)
+UPLOAD_BYTES = Histogram(
+    'yatube_upload_bytes',
+    'Размер принятых загрузок.',
+    (16 * 1024, 64 * 1024, 256 * 1024, 1024 ** 2, 4 * 1024 ** 2,
+     10 * 1024 ** 2),
+)
+THUMBNAIL_SECONDS = Histogram(
+    'yatube_thumbnail_seconds',
+    'Время нарезки превью и вариантов одной картинки.',
+    (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+
+def collect():
+    """Сумма значений из файлов всех процессов: ключ -> число."""
+    totals = defaultdict(float)
+    directory = settings.METRICS_DIR
+    if not os.path.isdir(directory):
+        return totals
+    for filename in os.listdir(directory):
+        if not filename.endswith('.db'):
+            continue
+        with open(os.path.join(directory, filename), 'rb') as file:
+            data = file.read()
+        for key, value, _ in read_entries(data):
+            totals[key] += value
+    return totals
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\')
+                         .replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return f'{{{pairs}}}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _histogram_lines(metric, samples):
+    lines = []
+    for labels in sorted(samples):
+        values = samples[labels]
+        cumulative = 0
+        for bound in metric.buckets:
+            cumulative += values.get(f'bucket:{bound}', 0)
+            bucket_labels = labels + (('le', _format_value(bound)),)
+            lines.append(
+                f'{metric.name}_bucket{_format_labels(bucket_labels)} '
+                f'{_format_value(cumulative)}'
+            )
+        for sample in ('sum', 'count'):
+            lines.append(
+                f'{metric.name}_{sample}{_format_labels(labels)} '
+                f'{_format_value(values.get(sample, 0))}'
+            )
+    return lines
+
+
+def _hit_ratio_lines(samples):
+    """Доля попаданий по каждому кешу — готовая, без PromQL."""
+    totals = defaultdict(lambda: defaultdict(float))
+    for labels, values in samples.items():
+        labels = dict(labels)
+        totals[labels['cache']][labels['result']] += values['']
+    lines = [
+        '# HELP yatube_cache_hit_ratio Доля попаданий в кеш.',
+        '# TYPE yatube_cache_hit_ratio gauge',
+    ]
+    for name in sorted(totals):
+        hits, misses = totals[name]['hit'], totals[name]['miss']
+        ratio = hits / (hits + misses) if hits + misses else 0
+        lines.append(
+            f'yatube_cache_hit_ratio{_format_labels([("cache", name)])} '
+            f'{_format_value(round(ratio, 4))}'
+        )
+    return lines
+
+
+def render():
+    """Все метрики в текстовом формате Prometheus 0.0.4."""
+    samples = defaultdict(lambda: defaultdict(dict))
+    for key, value in collect().items():
+        name, labels, sample = json.loads(key)
+        labels = tuple(tuple(pair) for pair in labels)
+        samples[name][labels][sample] = value
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        metric_samples = samples.get(metric.name, {})
+        if metric.kind == 'histogram':
+            lines.extend(_histogram_lines(metric, metric_samples))
+        else:
+            for labels in sorted(metric_samples):
+                lines.append(
+                    f'{metric.name}{_format_labels(labels)} '
+                    f'{_format_value(metric_samples[labels][""])}'
+                )
+        if metric is CACHE_REQUESTS:
+            lines.extend(_hit_ratio_lines(metric_samples))
+    return '\n'.join(lines) + '\n'
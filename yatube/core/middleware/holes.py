@@ -0,0 +1,21 @@
+from core.holes import fill
+
+
+class HolePunchMiddleware:
+    """Дорисовывает персональные вставки в HTML-ответах."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (response.streaming
+                or 'text/html' not in response.get('Content-Type', '')
+                or b'<!--hole:' not in response.content):
+            return response
+        response.content = fill(
+            request, response.content.decode(response.charset)
+        )
+        if response.has_header('Content-Length'):
+            response['Content-Length'] = str(len(response.content))
+        return response
@@ -0,0 +1,48 @@
+import logging
+import os
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from core import memory
+from core.introspection import selected_url_name
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryProfileMiddleware:
+    """Пик и оставшаяся память выбранных представлений — в лог.
+
+    Представления перечислены в MEMORY_PROFILE_URL_NAMES; последний
+    снимок каждого сохраняется в MEMORY_PROFILE_DIR для команды
+    memory_diff. Пустой список убирает middleware из цепочки.
+    """
+
+    def __init__(self, get_response):
+        if not settings.MEMORY_PROFILE_URL_NAMES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        url_name = selected_url_name(
+            request, settings.MEMORY_PROFILE_URL_NAMES
+        )
+        if url_name is None:
+            return self.get_response(request)
+        response, measurement = memory.measure(self.get_response, request)
+        if measurement is not None:
+            self.report(request, url_name, measurement)
+        return response
+
+    def report(self, request, url_name, measurement):
+        lines = [
+            f'{url_name} {request.path}: пик {measurement.peak / 1024:.1f} '
+            f'КиБ, осталось {measurement.retained / 1024:.1f} КиБ'
+        ]
+        for size, count, site in memory.top_sites(
+            measurement.snapshot, settings.MEMORY_PROFILE_TOP
+        ):
+            lines.append(f'    {size / 1024:.1f} КиБ, {count} блоков: {site}')
+        logger.info('\n'.join(lines))
+        os.makedirs(settings.MEMORY_PROFILE_DIR, exist_ok=True)
+        measurement.snapshot.dump(memory.snapshot_path(url_name))
@@ -0,0 +1,38 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from core import metrics
+
+
+class MetricsMiddleware:
+    """Время ответа и число запросов к БД по имени URL."""
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = []
+
+        def count(execute, sql, params, many, context):
+            queries.append(None)
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        # Неразрешённые адреса сводятся в одну метку, иначе каждый
+        # случайный путь плодил бы новую серию.
+        url_name = match.view_name if match else '<unresolved>'
+        metrics.REQUEST_SECONDS.observe(elapsed, url_name=url_name)
+        metrics.REQUEST_QUERIES.observe(len(queries), url_name=url_name)
+        return response
@@ -0,0 +1,35 @@
+import logging
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from core.nplusone import Detector, NPlusOneError
+
+logger = logging.getLogger(__name__)
+
+
+class NPlusOneMiddleware:
+    """Сообщает об N+1 в запросе: в лог или исключением.
+
+    Режим задаёт NPLUSONE_DETECT: 'log' для стейджинга, 'raise' для
+    разработки; пустое значение убирает middleware из цепочки.
+    """
+
+    def __init__(self, get_response):
+        if not settings.NPLUSONE_DETECT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        detector = Detector()
+        with detector.watch():
+            response = self.get_response(request)
+        if detector.repeats():
+            message = (
+                f'N+1 в {request.method} {request.path}:\n'
+                f'{detector.report()}'
+            )
+            if settings.NPLUSONE_DETECT == 'raise':
+                raise NPlusOneError(message)
+            logger.warning(message)
+        return response
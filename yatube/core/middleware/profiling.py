@@ -0,0 +1,32 @@
+from collections import defaultdict
+from itertools import count
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from core.introspection import selected_url_name
+from core.profiling import profile_call
+
+
+class SamplingProfilerMiddleware:
+    """Профилирует каждый PROFILE_SAMPLE_RATE-й запрос к выбранным URL.
+
+    Имена URL берутся из PROFILE_URL_NAMES; результаты пишутся
+    в PROFILE_DIR (см. core.profiling). Нулевая частота убирает
+    middleware из цепочки.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILE_SAMPLE_RATE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        # next() у itertools.count атомарен под GIL: счётчик не теряет
+        # запросы из параллельных потоков.
+        self.counters = defaultdict(count)
+
+    def __call__(self, request):
+        url_name = selected_url_name(request, settings.PROFILE_URL_NAMES)
+        if (url_name is None or next(self.counters[url_name])
+                % settings.PROFILE_SAMPLE_RATE):
+            return self.get_response(request)
+        return profile_call(url_name, self.get_response, request)
@@ -0,0 +1,206 @@
+"""Замеры запроса: SQL, рендер шаблонов, кеш и общее время.
+
+Итог уходит в заголовок Server-Timing (его показывают инструменты
+разработчика браузера) и одной JSON-строкой в лог core.middleware.timing.
+Выключенный SERVER_TIMING убирает middleware из цепочки целиком, а без
+активного замера обёртки шаблонов и кеша сразу зовут оригинал.
+"""
+import json
+import logging
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_installed = False
+_MISSING = object()
+TOKEN_RE = re.compile(r"[^!#$%&'*+\-.^_`|~0-9A-Za-z]")
+
+
+class Timings:
+    """Замеры одного запроса."""
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.templates = defaultdict(lambda: [0, 0.0])
+        self.render_ms = 0.0
+        self.render_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_depth = 0
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_count += 1
+            self.sql_ms += (time.perf_counter() - started) * 1000
+
+    def as_dict(self, total_ms):
+        return {
+            'total_ms': round(total_ms, 2),
+            'sql_count': self.sql_count,
+            'sql_ms': round(self.sql_ms, 2),
+            'render_ms': round(self.render_ms, 2),
+            'templates': {
+                name: {'count': count, 'ms': round(ms, 2)}
+                for name, (count, ms) in self.templates.items()
+            },
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+        }
+
+
+def current():
+    return getattr(_local, 'timings', None)
+
+
+def _timed_render(render):
+    @wraps(render)
+    def wrapper(self, context):
+        timings = current()
+        if timings is None:
+            return render(self, context)
+        timings.render_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            timings.render_depth -= 1
+            # Время вложенных шаблонов входит во время родителя: в сумму
+            # рендера идут только шаблоны верхнего уровня.
+            if not timings.render_depth:
+                timings.render_ms += elapsed
+            entry = timings.templates[self.name or '<string>']
+            entry[0] += 1
+            entry[1] += elapsed
+    return wrapper
+
+
+def _counted_get(get):
+    @wraps(get)
+    def wrapper(self, key, default=None, version=None):
+        timings = current()
+        if timings is None or timings.cache_depth:
+            return get(self, key, default, version)
+        timings.cache_depth += 1
+        try:
+            value = get(self, key, _MISSING, version)
+        finally:
+            timings.cache_depth -= 1
+        if value is _MISSING:
+            timings.cache_misses += 1
+            return default
+        timings.cache_hits += 1
+        return value
+    return wrapper
+
+
+def _counted_get_many(get_many):
+    @wraps(get_many)
+    def wrapper(self, keys, version=None):
+        timings = current()
+        if timings is None or timings.cache_depth:
+            return get_many(self, keys, version)
+        keys = list(keys)
+        # BaseCache.get_many перебирает ключи через get: вложенные
+        # вызовы не считаем второй раз.
+        timings.cache_depth += 1
+        try:
+            found = get_many(self, keys, version)
+        finally:
+            timings.cache_depth -= 1
+        timings.cache_hits += len(found)
+        timings.cache_misses += len(keys) - len(found)
+        return found
+    return wrapper
+
+
+def install():
+    """Оборачивает рендер шаблонов и чтение из кеша — один раз на процесс."""
+    global _installed
+    if _installed:
+        return
+    Template._render = _timed_render(Template._render)
+    for backend in {type(caches[alias]) for alias in settings.CACHES}:
+        backend.get = _counted_get(backend.get)
+        backend.get_many = _counted_get_many(backend.get_many)
+    _installed = True
+
+
+def metric(name, ms=None, desc=None):
+    parts = [TOKEN_RE.sub('-', name)]
+    if ms is not None:
+        parts.append(f'dur={ms:.1f}')
+    if desc:
+        parts.append('desc="{}"'.format(desc.replace('"', "'")))
+    return ';'.join(parts)
+
+
+def server_timing(data):
+    metrics = [
+        metric('total', data['total_ms']),
+        metric('sql', data['sql_ms'], f'{data["sql_count"]} queries'),
+        metric('tpl', data['render_ms']),
+    ]
+    # Значения заголовка — latin-1, поэтому описания по-английски.
+    for name, entry in data['templates'].items():
+        metrics.append(metric(
+            f'tpl-{name}', entry['ms'], f'{name} x{entry["count"]}'
+        ))
+    metrics.append(metric(
+        'cache',
+        desc=f'hits {data["cache_hits"]}, misses {data["cache_misses"]}',
+    ))
+    return ', '.join(metrics)
+
+
+class ServerTimingMiddleware:
+    """Меряет запрос и отдаёт замеры в Server-Timing и в лог.
+
+    Ставится первым в MIDDLEWARE, чтобы общее время покрывало остальные.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING:
+            raise MiddlewareNotUsed
+        install()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = _local.timings = Timings()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timings.execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            _local.timings = None
+        data = timings.as_dict((time.perf_counter() - started) * 1000)
+        response['Server-Timing'] = server_timing(data)
+        logger.info(
+            json.dumps(
+                {'method': request.method, 'path': request.path,
+                 'status': response.status_code, **data},
+                ensure_ascii=False,
+            ),
+            extra={'timing': data},
+        )
+        return response
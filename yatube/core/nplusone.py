@@ -0,0 +1,110 @@
+"""Поиск N+1: один и тот же по форме SELECT, повторённый в запросе.
+
+Запросы нормализуются (литералы и списки IN заменяются заглушками),
+и если одна форма встречается не меньше NPLUSONE_THRESHOLD раз,
+это почти всегда обращение к связанному объекту в цикле. К каждому
+повтору прикладывается место вызова: строка шаблона, если запрос
+пришёл из рендера, и строка нашего Python-кода.
+"""
+import os
+import re
+import sys
+from collections import Counter, namedtuple
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.template.base import Node
+
+LITERALS_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+IN_LIST_RE = re.compile(r'\bIN \((?:(?:\?|%s), )*(?:\?|%s)\)')
+# Свои файлы — в проекте, но не в окружении и не в этом модуле.
+SKIP_PATHS = ('site-packages', 'dist-packages', __file__)
+
+Repeat = namedtuple('Repeat', ['sql', 'count', 'sites'])
+
+
+class NPlusOneError(AssertionError):
+    pass
+
+
+def shape(sql):
+    """SQL без литералов: запросы, отличающиеся только id, совпадают."""
+    return IN_LIST_RE.sub('IN (...)', LITERALS_RE.sub('?', sql))
+
+
+def call_site():
+    """Где выполнен запрос: строка шаблона и строка своего кода."""
+    template = code = None
+    frame = sys._getframe(2)
+    while frame is not None and not (template and code):
+        node = frame.f_locals.get('self')
+        if (template is None and frame.f_code.co_name == 'render_annotated'
+                and isinstance(node, Node) and node.origin):
+            name = node.origin.template_name or node.origin.name
+            template = f'{name}:{node.token.lineno}'
+        filename = frame.f_code.co_filename
+        if (code is None and filename.startswith(settings.BASE_DIR)
+                and not any(path in filename for path in SKIP_PATHS)):
+            relative = os.path.relpath(filename, settings.BASE_DIR)
+            code = f'{relative}:{frame.f_lineno}'
+        frame = frame.f_back
+    return ' <- '.join(site for site in (template, code) if site)
+
+
+class Detector:
+    """Собирает SELECT-запросы и находит повторы одной формы."""
+
+    def __init__(self, threshold=None):
+        if threshold is None:
+            threshold = settings.NPLUSONE_THRESHOLD
+        self.threshold = threshold
+        self.shapes = Counter()
+        self.sites = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip()[:6].upper() == 'SELECT':
+            key = shape(sql)
+            self.shapes[key] += 1
+            self.sites.setdefault(key, Counter())[call_site()] += 1
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def watch(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    def repeats(self):
+        return [
+            Repeat(sql, count, self.sites[sql].most_common())
+            for sql, count in self.shapes.most_common()
+            if count >= self.threshold
+        ]
+
+    def report(self):
+        lines = []
+        for repeat in self.repeats():
+            lines.append(f'{repeat.count} раз: {repeat.sql}')
+            lines.extend(
+                f'    {count} x {site or "?"}' for site, count in repeat.sites
+            )
+        return '\n'.join(lines)
+
+
+@contextmanager
+def detect(threshold=None):
+    """Бросает NPlusOneError, если в блоке нашлись N+1."""
+    detector = Detector(threshold)
+    with detector.watch():
+        yield detector
+    if detector.repeats():
+        raise NPlusOneError(f'Найдены N+1 запросы:\n{detector.report()}')
+
+
+class NPlusOneTestMixin:
+    """Проверка для TestCase: with self.assertNoNPlusOne(): ..."""
+
+    def assertNoNPlusOne(self, threshold=None):
+        return detect(threshold)
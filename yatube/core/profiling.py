@@ -0,0 +1,138 @@
+"""Выборочное профилирование запросов под реальной нагрузкой.
+
+Запрос, попавший в выборку, проходит под cProfile, а параллельно
+отдельный поток снимает его стек раз в PROFILE_INTERVAL. Результаты
+копятся по имени URL в пределах процесса; сводит их и перезаписывает
+в PROFILE_DIR фоновый поток, так что запрос за диском не ждёт:
+
+* <имя>.<pid>.pstats — для pstats, snakeviz и т. п.; файлы разных
+  процессов сливаются через pstats.Stats(*files);
+* <имя>.<pid>.collapsed — свёрнутые стеки «a;b;c число» для
+  flamegraph.pl и speedscope; файлы процессов можно просто склеить.
+
+Выборщик делит GIL с запросом, поэтому абсолютные времена немного
+завышены — смотреть стоит на доли.
+"""
+import cProfile
+import os
+import pstats
+import queue
+import sys
+import threading
+from collections import Counter
+
+from django.conf import settings
+
+from core.introspection import file_name, short_path
+
+
+def frame_name(frame):
+    """Функция кадра с коротким путём к файлу, без пробелов и ';'."""
+    code = frame.f_code
+    filename = short_path(code.co_filename)
+    name = f'{code.co_name} ({filename}:{code.co_firstlineno})'
+    return name.replace(';', ':').replace(' ', '_')
+
+
+def collapse(frame):
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    """Снимает стек потока thread_id, пока не вызван stop()."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+
+class Profiles:
+    """Накопленные профили процесса по имени URL.
+
+    add() только ставит замер в очередь; сводка и запись файлов идут
+    в отдельном потоке, который запускается при первом замере.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.stacks = {}
+        self.queue = queue.Queue()
+        self._writer = None
+
+    def path(self, url_name, extension):
+        return os.path.join(
+            settings.PROFILE_DIR,
+            f'{file_name(url_name)}.{os.getpid()}.{extension}',
+        )
+
+    def add(self, url_name, profile, stacks):
+        with self.lock:
+            # После fork поток родителя в дочернем процессе не живёт.
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(
+                    target=self._run, daemon=True
+                )
+                self._writer.start()
+        self.queue.put((url_name, profile, stacks))
+
+    def flush(self):
+        """Ждёт, пока все поставленные замеры окажутся в файлах."""
+        self.queue.join()
+
+    def _run(self):
+        while True:
+            url_name, profile, stacks = self.queue.get()
+            try:
+                self._write(url_name, profile, stacks)
+            finally:
+                self.queue.task_done()
+
+    def _write(self, url_name, profile, stacks):
+        if url_name in self.stats:
+            self.stats[url_name].add(profile)
+        else:
+            self.stats[url_name] = pstats.Stats(profile)
+        self.stacks.setdefault(url_name, Counter()).update(stacks)
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        self.stats[url_name].dump_stats(self.path(url_name, 'pstats'))
+        with open(self.path(url_name, 'collapsed'), 'w') as file:
+            for stack, count in self.stacks[url_name].most_common():
+                file.write(f'{stack} {count}\n')
+
+
+profiles = Profiles()
+
+
+def profile_call(url_name, function, *args, **kwargs):
+    """Выполняет function под профилировщиком и копит результат."""
+    sampler = StackSampler(threading.get_ident(), settings.PROFILE_INTERVAL)
+    profile = cProfile.Profile()
+    sampler.start()
+    profile.enable()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        profile.disable()
+        sampler.stop()
+        profiles.add(url_name, profile, sampler.stacks)
@@ -0,0 +1,11 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core.holes import marker
+
+register = template.Library()
+
+
+@register.simple_tag
+def hole(name, **kwargs):
+    return mark_safe(marker(name, **kwargs))
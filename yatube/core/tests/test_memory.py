@@ -0,0 +1,90 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+
+from core import memory, profiling
+from posts.models import Comment, Post
+
+User = get_user_model()
+MEMORY_DIR = tempfile.mkdtemp()
+
+
+@override_settings(
+    MEMORY_PROFILE_URL_NAMES=('posts:post_detail',),
+    MEMORY_PROFILE_DIR=MEMORY_DIR,
+)
+class MemoryProfileTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=author, text='Пост')
+        for number in range(10):
+            Comment.objects.create(
+                post=cls.post, author=author, text=f'Комментарий {number}'
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEMORY_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def get_detail(self, client):
+        cache.clear()
+        with self.assertLogs('core.middleware.memory', 'INFO') as logs:
+            client.get(f'/posts/{self.post.pk}/')
+        return logs.output[0]
+
+    def test_report_and_diff(self):
+        """Лог с пиком и местами выделений, снимки сравниваются."""
+        client = Client()
+        report = self.get_detail(client)
+        self.assertRegex(
+            report, rf'posts:post_detail /posts/{self.post.pk}/: пик [\d.]+'
+        )
+        self.assertRegex(report, r'КиБ, \d+ блоков: \S+:\d+')
+        snapshot = os.path.join(
+            MEMORY_DIR, f'posts-post_detail.{os.getpid()}.snapshot'
+        )
+        old = os.path.join(MEMORY_DIR, 'old.snapshot')
+        os.rename(snapshot, old)
+        self.get_detail(client)
+        out = StringIO()
+        call_command('memory_diff', old, snapshot, top=5, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertRegex(lines[0], r'^Всего: [+-][\d.]+ КиБ$')
+        self.assertLessEqual(len(lines), 6)
+
+    def test_other_views_not_traced(self):
+        with self.assertRaises(AssertionError):
+            with self.assertLogs('core.middleware.memory', 'INFO'):
+                Client().get('/')
+
+
+class MeasureTest(TestCase):
+    def test_profiler_threads_filtered_out(self):
+        """Выделения потоков профилировщика не попадают в замер."""
+        kept = []
+
+        def work():
+            thread = threading.Thread(target=lambda: kept.extend(
+                profiling.collapse(sys._getframe()) for _ in range(50)
+            ))
+            thread.start()
+            thread.join()
+            return len(kept)
+
+        result, measurement = memory.measure(work)
+        self.assertEqual(result, 50)
+        self.assertIsNotNone(measurement)
+        for trace in measurement.snapshot.traces:
+            for frame in trace.traceback:
+                self.assertNotEqual(frame.filename, profiling.__file__)
@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+
+from core import metrics
+from posts.models import Post
+
+User = get_user_model()
+METRICS_DIR = tempfile.mkdtemp()
+
+
+@override_settings(METRICS_ENABLED=True, METRICS_DIR=METRICS_DIR)
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        Post.objects.create(
+            author=User.objects.create_user(username='author'), text='Пост'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        metrics.storage.reset()
+        for filename in os.listdir(METRICS_DIR):
+            os.remove(os.path.join(METRICS_DIR, filename))
+        cache.clear()
+
+    def tearDown(self):
+        metrics.storage.reset()
+
+    def test_request_and_cache_metrics(self):
+        """Время, запросы и попадания в кеш страницы по имени URL."""
+        client = Client()
+        client.get('/')
+        client.get('/')
+        response = client.get('/metrics')
+        self.assertEqual(
+            response['Content-Type'],
+            'text/plain; version=0.0.4; charset=utf-8',
+        )
+        text = response.content.decode()
+        self.assertIn('# TYPE yatube_request_duration_seconds histogram',
+                      text)
+        self.assertIn(
+            'yatube_request_duration_seconds_count{url_name="posts:index"} 2',
+            text,
+        )
+        self.assertIn(
+            'yatube_request_queries_bucket'
+            '{url_name="posts:index",le="+Inf"} 2',
+            text,
+        )
+        self.assertIn(
+            'yatube_cache_requests_total{cache="index_page",result="hit"} 1',
+            text,
+        )
+        self.assertIn('yatube_cache_hit_ratio{cache="index_page"} 0.5', text)
+        self.assertIn(
+            'yatube_cache_requests_total{cache="post_card",result="miss"} 1',
+            text,
+        )
+
+    def test_values_summed_across_processes(self):
+        """Файлы других воркеров складываются с файлом текущего."""
+        metrics.UPLOAD_BYTES.observe(1000)
+        other = metrics.ValueFile(os.path.join(METRICS_DIR, '1.db'))
+        for bucket in range(3000):
+            # Много ключей: файл должен вырасти за начальный размер.
+            other.increment(metrics._key('padding', {'n': bucket}), 1)
+        other.increment(
+            metrics._key('yatube_upload_bytes', {}, 'count'), 2
+        )
+        other.close()
+        text = Client().get('/metrics').content.decode()
+        self.assertIn('yatube_upload_bytes_count 3', text)
+        self.assertIn('yatube_upload_bytes_bucket{le="16384"} 1', text)
+
+    def test_only_local_collector(self):
+        response = Client(REMOTE_ADDR='10.0.0.1').get('/metrics')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token_required_when_set(self):
+        """С токеном не помогает и локальный адрес, нужен заголовок."""
+        client = Client()
+        self.assertEqual(client.get('/metrics').status_code, 403)
+        response = client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 403)
+        response = Client(REMOTE_ADDR='10.0.0.1').get(
+            '/metrics', HTTP_AUTHORIZATION='Bearer secret'
+        )
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.template import engines
+from django.test import RequestFactory, TestCase, override_settings
+
+from core.middleware.nplusone import NPlusOneMiddleware
+from core.nplusone import NPlusOneError, NPlusOneTestMixin, detect, shape
+from posts.models import Post
+
+User = get_user_model()
+
+
+def naive_view(request):
+    """Представление с N+1: автор каждого поста — отдельный запрос."""
+    template = engines['django'].from_string(
+        '{% for post in posts %}{{ post.author.username }}{% endfor %}'
+    )
+    return HttpResponse(template.render({'posts': Post.objects.all()}))
+
+
+class NPlusOneTest(NPlusOneTestMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for number in range(4):
+            author = User.objects.create_user(username=f'author{number}')
+            Post.objects.create(author=author, text=f'Пост {number}')
+
+    def test_shape_ignores_literals(self):
+        """Запросы с разными id и списками IN имеют одну форму."""
+        self.assertEqual(
+            shape("SELECT * FROM t WHERE id = 1 AND s = 'a''b'"),
+            shape("SELECT * FROM t WHERE id = 22 AND s = 'x'"),
+        )
+        self.assertEqual(
+            shape('SELECT * FROM t WHERE id IN (1, 2, 3)'),
+            shape('SELECT * FROM t WHERE id IN (4)'),
+        )
+        self.assertEqual(
+            shape('SELECT * FROM t WHERE id IN (%s, %s)'),
+            shape('SELECT * FROM t WHERE id IN (%s)'),
+        )
+
+    def test_detects_repeats_with_call_site(self):
+        """Повторы находятся, к ним приложены шаблон и строка кода."""
+        with self.assertRaises(NPlusOneError) as error:
+            with self.assertNoNPlusOne():
+                naive_view(RequestFactory().get('/'))
+        message = str(error.exception)
+        self.assertIn('4 раз', message)
+        self.assertIn('<unknown source>:1', message)
+        self.assertIn('core/tests/test_nplusone.py', message)
+
+    def test_select_related_passes(self):
+        with detect():
+            [post.author.username
+             for post in Post.objects.select_related('author')]
+
+    @override_settings(NPLUSONE_DETECT='log')
+    def test_middleware_logs(self):
+        """В режиме log ответ отдаётся, а N+1 уходит в лог."""
+        middleware = NPlusOneMiddleware(naive_view)
+        with self.assertLogs('core.middleware.nplusone', 'WARNING') as logs:
+            response = middleware(RequestFactory().get('/naive/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('N+1 в GET /naive/', logs.output[0])
+
+    @override_settings(NPLUSONE_DETECT='raise')
+    def test_middleware_raises(self):
+        with self.assertRaises(NPlusOneError):
+            NPlusOneMiddleware(naive_view)(RequestFactory().get('/'))
@@ -0,0 +1,66 @@
+import os
+import pstats
+import re
+import shutil
+import sys
+import tempfile
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+
+from core import profiling
+
+PROFILE_DIR = tempfile.mkdtemp()
+COLLAPSED_RE = re.compile(r'^[^ ;]+(;[^ ;]+)* \d+$')
+
+
+@override_settings(
+    PROFILE_SAMPLE_RATE=2,
+    PROFILE_URL_NAMES=('posts:index',),
+    PROFILE_DIR=PROFILE_DIR,
+)
+class SamplingProfilerTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(PROFILE_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        profiling.profiles = profiling.Profiles()
+        shutil.rmtree(PROFILE_DIR, ignore_errors=True)
+
+    def path(self, extension):
+        return os.path.join(
+            PROFILE_DIR, f'posts-index.{os.getpid()}.{extension}'
+        )
+
+    def test_one_in_n_requests_profiled(self):
+        """Профилируется каждый второй запрос к выбранному URL."""
+        client = Client()
+        for _ in range(4):
+            cache.clear()
+            client.get('/')
+        client.get('/about/author/')
+        profiling.profiles.flush()
+        self.assertEqual(os.listdir(PROFILE_DIR), [
+            name for name in os.listdir(PROFILE_DIR)
+            if name.startswith('posts-index.')
+        ])
+        stats = pstats.Stats(self.path('pstats'))
+        calls = {
+            (os.path.basename(filename), function): stat[1]
+            for (filename, _, function), stat in stats.stats.items()
+        }
+        self.assertEqual(calls[('views.py', 'index')], 2)
+        with open(self.path('collapsed')) as file:
+            for line in file:
+                self.assertRegex(line.rstrip('\n'), COLLAPSED_RE)
+
+    def test_collapse_stack(self):
+        """Стек разворачивается от корня, без пробелов внутри имён."""
+        stack = profiling.collapse(sys._getframe())
+        self.assertRegex(
+            stack,
+            r';test_collapse_stack_\(core/tests/test_profiling.py:\d+\)$',
+        )
+        self.assertNotIn(' ', stack)
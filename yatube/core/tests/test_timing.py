@@ -0,0 +1,42 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+
+from posts.models import Post
+
+User = get_user_model()
+
+
+class ServerTimingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='author')
+        Post.objects.bulk_create(
+            Post(author=author, text=f'Пост {number}') for number in range(3)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_disabled_by_default(self):
+        """Выключенные замеры не добавляют заголовок."""
+        response = Client().get('/')
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        """Заголовок содержит SQL, шаблоны по отдельности и кеш."""
+        client = Client()
+        with self.assertLogs('core.middleware.timing', 'INFO') as logs:
+            header = client.get('/')['Server-Timing']
+        self.assertRegex(header, r'total;dur=[\d.]+')
+        self.assertRegex(header, r'sql;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn('tpl-posts-index.html;', header)
+        self.assertIn('desc="includes/post.html x3"', header)
+        self.assertRegex(header, r'cache;desc="hits \d+, misses [1-9]')
+        self.assertIn('"path": "/"', logs.output[0])
+        # Второй раз страница отдаётся из кеша.
+        with self.assertLogs('core.middleware.timing', 'INFO'):
+            header = client.get('/')['Server-Timing']
+        self.assertRegex(header, r'cache;desc="hits [1-9]')
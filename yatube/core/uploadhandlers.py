@@ -0,0 +1,67 @@
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from PIL import Image
+
+from core import metrics
+
+# Сколько начала файла держим в памяти, ожидая заголовок картинки:
+# у JPEG перед размерами может идти крупный блок EXIF.
+HEADER_LIMIT = 256 * 1024
+
+
+class BoundedImageUploadHandler(FileUploadHandler):
+    """Ограничивает загрузку по мере прихода чанков.
+
+    Обработчик стоит первым и только пропускает данные дальше, считая
+    байты и читая размеры из заголовка картинки. Превышение лимита
+    прерывает приём файла, а причина остаётся в request.upload_errors,
+    откуда её забирает форма.
+    """
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.received = 0
+        self.header = b''
+        self.probed = False
+
+    def reject(self, message):
+        if not hasattr(self.request, 'upload_errors'):
+            self.request.upload_errors = {}
+        self.request.upload_errors[self.field_name] = message
+        raise SkipFile(message)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.IMAGE_UPLOAD_MAX_BYTES:
+            self.reject('Файл больше {} МБ.'.format(
+                settings.IMAGE_UPLOAD_MAX_BYTES // (1024 * 1024)
+            ))
+        if not self.probed:
+            self.header += raw_data
+            self.probe()
+        return raw_data
+
+    def probe(self):
+        # Image.open читает только заголовок, пиксели не декодируются.
+        try:
+            with Image.open(BytesIO(self.header)) as image:
+                width, height = image.size
+        except Image.DecompressionBombError:
+            width, height = settings.IMAGE_UPLOAD_MAX_PIXELS, 2
+        except Exception:
+            # Заголовок ещё не пришёл целиком или это не картинка:
+            # во втором случае файл отклонит валидация формы.
+            if len(self.header) >= HEADER_LIMIT:
+                self.probed, self.header = True, b''
+            return
+        self.probed, self.header = True, b''
+        if width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+            self.reject('Картинка больше {} мегапикселей.'.format(
+                settings.IMAGE_UPLOAD_MAX_PIXELS // 1000000
+            ))
+
+    def file_complete(self, file_size):
+        metrics.UPLOAD_BYTES.observe(self.received)
+        return None
@@ -1,5 +1,12 @@
+import hmac
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
 from django.shortcuts import render
 
+from core import metrics as app_metrics
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +22,26 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=403)
+
+
+def metrics_allowed(request):
+    if settings.METRICS_TOKEN:
+        expected = f'Bearer {settings.METRICS_TOKEN}'
+        given = request.META.get('HTTP_AUTHORIZATION', '')
+        return hmac.compare_digest(given.encode(), expected.encode())
+    return request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+
+
+def metrics(request):
+    """Метрики для сборщика в формате Prometheus.
+
+    С METRICS_TOKEN нужен заголовок Authorization с этим токеном. Без него
+    проверяется только REMOTE_ADDR, а за прокси это адрес прокси —
+    тогда /metrics должен быть закрыт на самом прокси.
+    """
+    if not metrics_allowed(request):
+        raise PermissionDenied
+    return HttpResponse(
+        app_metrics.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
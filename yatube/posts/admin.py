@@ -1,5 +1,8 @@
 from django.contrib import admin
+from django.db import connection
+from django.db.models.expressions import RawSQL
 
+from . import search
 from .models import Group, Post, Comment
 
 
@@ -10,6 +13,18 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Вместо LIKE '%...%' по всей таблице — запрос к индексу FTS5.
+        match = search.to_match(search_term)
+        if not match or not search.available(connection):
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        return queryset.filter(pk__in=RawSQL(
+            'SELECT rowid FROM posts_post_fts WHERE posts_post_fts MATCH %s',
+            [match],
+        )), False
+
 
 admin.site.register(Group)
 admin.site.register(Post, PostAdmin)
@@ -0,0 +1,98 @@
+import time
+from functools import wraps
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import (get_cache_key, learn_cache_key,
+                                patch_vary_headers)
+
+from core import metrics
+
+VERSION_KEY = 'version:{}'
+
+
+def _version_key(scope):
+    # В области попадают слаги и имена пользователей: хешируем их,
+    # чтобы ключ оставался ASCII и укладывался в лимиты memcached.
+    return VERSION_KEY.format(md5(scope.encode()).hexdigest())
+
+
+def _initial_version():
+    # Счётчик стартует с текущего времени, а не с единицы: если ключ версии
+    # вытеснили из кеша, новые ключи не совпадут со старыми записями.
+    return int(time.time() * 1000)
+
+
+def get_version(scope):
+    """Возвращает текущую версию данных для области кеширования."""
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def get_versions(*scopes):
+    """Версии нескольких областей сразу: область -> версия."""
+    keys = {scope: _version_key(scope) for scope in scopes}
+    found = cache.get_many(keys.values())
+    missed = [key for key in keys.values() if key not in found]
+    if missed:
+        for key in missed:
+            cache.add(key, _initial_version(), None)
+        found.update(cache.get_many(missed))
+    return {scope: found.get(key) for scope, key in keys.items()}
+
+
+def bump_version(*scopes):
+    """Инвалидирует всё, что закешировано под указанными областями."""
+    for scope in scopes:
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), None)
+
+
+def cache_page_versioned(key_prefix, scopes, timeout=None):
+    """Кеширует страницу, пока не изменятся данные её областей.
+
+    scopes получает именованные аргументы представления и возвращает
+    имена областей; версии областей входят в ключ, поэтому сигнал записи
+    делает старую копию недостижимой, а TTL служит лишь страховкой.
+    """
+    if timeout is None:
+        timeout = settings.PAGE_CACHE_TIMEOUT
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            prefix = '{}:{}'.format(key_prefix, '.'.join(
+                str(get_version(scope)) for scope in scopes(**kwargs)
+            ))
+            cache_key = get_cache_key(request, prefix, 'GET', cache=cache)
+            if cache_key is not None:
+                response = cache.get(cache_key)
+                if response is not None:
+                    metrics.CACHE_REQUESTS.inc(cache=key_prefix, result='hit')
+                    return response
+            metrics.CACHE_REQUESTS.inc(cache=key_prefix, result='miss')
+            response = view(request, *args, **kwargs)
+            if response.streaming or response.status_code != 200:
+                return response
+            # Сессия и CSRF-cookie добавят Vary: Cookie только снаружи
+            # представления, а ключ вычисляется здесь.
+            if (request.session.accessed
+                    or request.META.get('CSRF_COOKIE_USED')):
+                patch_vary_headers(response, ('Cookie',))
+            cache_key = learn_cache_key(
+                request, response, timeout, prefix, cache=cache
+            )
+            cache.set(cache_key, response, timeout)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,72 @@
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+# (модель, счётчик, что считаем, внешний ключ на модель)
+COUNTERS = (
+    (Post, 'comments_count', Comment, 'post'),
+    (Group, 'posts_count', Post, 'group'),
+    (UserStats, 'posts_count', Post, 'author'),
+    (UserStats, 'followers_count', Follow, 'author'),
+    (UserStats, 'following_count', Follow, 'user'),
+)
+
+
+def bump(model, pk, **deltas):
+    """Атомарно сдвигает счётчики одной строки выражением F()."""
+    return model.objects.filter(pk=pk).update(**{
+        field: F(field) + delta for field, delta in deltas.items()
+    })
+
+
+def bump_user(user_id, **deltas):
+    if bump(UserStats, user_id, **deltas):
+        return
+    # Строку заводим только на рост: при каскадном удалении пользователя
+    # новая запись счётчиков нарушила бы внешний ключ.
+    if all(delta > 0 for delta in deltas.values()):
+        UserStats.objects.get_or_create(user_id=user_id)
+        bump(UserStats, user_id, **deltas)
+
+
+def actual_count(source, fk):
+    return Coalesce(Subquery(
+        source.objects.filter(**{fk: OuterRef('pk')}).order_by().values(
+            fk
+        ).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def reconcile(batch_size=1000):
+    """Пересчитывает все счётчики пачкой UPDATE.
+
+    Возвращает число исправленных строк для каждого счётчика.
+    """
+    missing = User.objects.filter(stats__isnull=True).values_list(
+        'pk', flat=True
+    ).iterator()
+    while True:
+        batch = [
+            UserStats(user_id=pk) for pk in islice(missing, batch_size)
+        ]
+        if not batch:
+            break
+        UserStats.objects.bulk_create(batch, ignore_conflicts=True)
+    fixed = {}
+    with transaction.atomic():
+        for model, field, source, fk in COUNTERS:
+            actual = actual_count(source, fk)
+            drifted = model.objects.annotate(actual=actual).exclude(
+                **{field: F('actual')}
+            )
+            fixed[f'{model.__name__}.{field}'] = model.objects.filter(
+                pk__in=drifted.values('pk')
+            ).update(**{field: actual})
+    return fixed
@@ -0,0 +1,219 @@
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import FeedItem, Follow, Post, UserStats
+from .utils import keyset_rows
+
+
+def is_celebrity(author_id):
+    """Посты автора не раскладываются по лентам, а читаются на лету.
+
+    Признак хранится в UserStats.celebrity и меняется только вместе
+    с лентами (см. follow_changed), поэтому все процессы видят одно.
+    """
+    return UserStats.objects.filter(user_id=author_id, celebrity=True).exists()
+
+
+def _bulk_insert(items):
+    # bulk_create сам превращает вход в список, поэтому режем поток
+    # на пачки заранее, чтобы память не росла с числом подписчиков.
+    items = iter(items)
+    while True:
+        batch = list(islice(items, settings.FEED_BATCH_SIZE))
+        if not batch:
+            return
+        FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def push_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _bulk_insert(
+        FeedItem(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def _fan_out(author_id, followers, since=None, limit=None):
+    """Раскладывает читателям посты автора: с since и не больше limit
+    последних, если они заданы."""
+    posts = Post.objects.filter(author_id=author_id)
+    if since is not None:
+        posts = posts.filter(pub_date__gte=since)
+    posts = posts.order_by('-pub_date', '-id')[:limit]
+    posts = list(posts.values_list('id', 'pub_date'))
+    _bulk_insert(
+        FeedItem(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for user_id in followers
+        for post_id, pub_date in posts
+    )
+
+
+def backfill(follow):
+    """Добавляет в ленту читателя уже опубликованные посты автора."""
+    if not is_celebrity(follow.author_id):
+        _fan_out(follow.author_id, [follow.user_id])
+
+
+def follow_changed(author_id):
+    """Делает автора «звездой», когда подписчиков стало достаточно.
+
+    Зовётся после пересчёта followers_count. Ставший «звездой» автор
+    просто перестаёт раскладываться: старые записи лент остаются,
+    а повторы слияние отбрасывает. Обратный переход дорог и делается
+    не в запросе, а командой demote_celebrities.
+    """
+    UserStats.objects.filter(
+        user_id=author_id, celebrity=False,
+        followers_count__gte=settings.FEED_CELEBRITY_THRESHOLD,
+    ).update(celebrity=True)
+
+
+def demotion_candidates():
+    """«Звёзды», у которых подписчиков стало меньше нижнего порога.
+
+    Порог ниже FEED_CELEBRITY_THRESHOLD: автор у самой границы
+    не перекладывается туда-обратно на каждую подписку и отписку.
+    """
+    return UserStats.objects.filter(
+        celebrity=True,
+        followers_count__lt=settings.FEED_CELEBRITY_DEMOTE_THRESHOLD,
+    ).values_list('user_id', flat=True)
+
+
+def demote(author_id):
+    """Возвращает автора к раскладке по лентам.
+
+    Подписчикам раскладываются последние FEED_DEMOTE_POSTS постов —
+    до снятия признака, пока читатели ещё получают их на лету; более
+    старые посты «звёздного» периода из ленты уходят. Посты,
+    опубликованные, пока шла раскладка, добираются вторым проходом.
+    Возвращает, снят ли признак.
+    """
+    started = timezone.now()
+    followers = Follow.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True
+    )
+    limit = settings.FEED_DEMOTE_POSTS
+    _fan_out(author_id, followers.iterator(), limit=limit)
+    demoted = demotion_candidates().filter(user_id=author_id).update(
+        celebrity=False
+    )
+    if demoted:
+        _fan_out(author_id, followers.iterator(), since=started, limit=limit)
+    return bool(demoted)
+
+
+def mark_celebrities():
+    """Выставляет признак всем авторам по числу подписчиков.
+
+    Для массовой загрузки: ленты после этого раскладываются заново.
+    """
+    UserStats.objects.filter(
+        followers_count__gte=settings.FEED_CELEBRITY_THRESHOLD,
+        celebrity=False,
+    ).update(celebrity=True)
+    UserStats.objects.filter(
+        followers_count__lt=settings.FEED_CELEBRITY_DEMOTE_THRESHOLD,
+        celebrity=True,
+    ).update(celebrity=False)
+
+
+def prune(follow):
+    """Убирает из ленты читателя посты автора, от которого он отписался."""
+    FeedItem.objects.filter(
+        user_id=follow.user_id, post__author_id=follow.author_id
+    ).delete()
+
+
+class HybridFeed:
+    """Лента подписок: разложенный inbox плюс посты «звёзд» на лету.
+
+    Каждый источник отдаёт посты по убыванию (pub_date, id) по своему
+    индексу, а лента сливает их k-путевым слиянием. Номерная страница
+    без «звёзд» — это OFFSET по inbox в БД; со «звёздами» каждый источник
+    ограничивается концом страницы до слияния, поэтому ни один запрос
+    не читает и не сортирует ленту целиком. Счётчик складывается из
+    inbox и не попавших в него постов «звёзд» и кешируется пагинатором.
+    """
+    model = Post
+    ordered = True
+
+    def __init__(self, user):
+        self.user_id = user.pk
+        self.inbox = FeedItem.objects.filter(user=user).select_related(
+            'post__group', 'post__author'
+        )
+        self.celebrities = list(
+            Follow.objects.filter(
+                user=user, author__stats__celebrity=True
+            ).values_list('author_id', flat=True)
+        )
+
+    @property
+    def count_signature(self):
+        return 'hybrid_feed:{}:{}'.format(
+            self.user_id, ','.join(map(str, sorted(self.celebrities)))
+        )
+
+    def _sources(self, values, lookup, limit):
+        yield [
+            item.post for item in keyset_rows(
+                self.inbox, ('pub_date', 'post_id'), values, lookup, limit
+            )
+        ]
+        posts = Post.objects.select_related('group', 'author')
+        for author_id in self.celebrities:
+            yield keyset_rows(
+                posts.filter(author_id=author_id), ('pub_date', 'id'),
+                values, lookup, limit
+            )
+
+    def keyset_rows(self, values, lookup, limit):
+        merged = heapq.merge(
+            *self._sources(values, lookup, limit),
+            key=lambda post: (post.pub_date, post.id),
+            reverse=lookup != 'gt',
+        )
+        rows = []
+        for post in merged:
+            # Пост «звезды» мог попасть в inbox до того, как автор
+            # перешёл порог, и придёт из двух источников подряд.
+            if rows and rows[-1].id == post.id:
+                continue
+            rows.append(post)
+            if len(rows) == limit:
+                break
+        return rows
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step:
+            raise TypeError('HybridFeed supports only plain slices')
+        if not self.celebrities:
+            return [
+                item.post for item in
+                self.inbox.order_by('-pub_date', '-post_id')[index]
+            ]
+        return self.keyset_rows(None, 'lt', index.stop)[index]
+
+    def count(self):
+        count = self.inbox.count()
+        if self.celebrities:
+            # Посты, разложенные до перехода автора в «звёзды», уже
+            # посчитаны в inbox.
+            count += Post.objects.filter(
+                author_id__in=self.celebrities
+            ).exclude(
+                pk__in=self.inbox.values('post_id')
+            ).count()
+        return count
+
+    def exists(self):
+        return self.inbox.exists() or bool(self.celebrities)
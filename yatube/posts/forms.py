@@ -1,12 +1,69 @@
+from io import BytesIO
+
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile, UploadedFile
+from PIL import Image, ImageOps
+
+from . import thumbnails
 from .models import Post, Comment
 
 
+def downscale(upload):
+    """Уменьшает слишком большой оригинал ещё при загрузке."""
+    side = settings.POST_IMAGE_MAX_SIDE
+    upload.seek(0)
+    image = Image.open(upload)
+    if max(image.size) <= side:
+        upload.seek(0)
+        return upload
+    image_format = image.format
+    # Для JPEG draft декодирует сразу в уменьшенном масштабе,
+    # и полноразмерный растр в памяти не появляется.
+    image.draft('RGB', (side, side))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((side, side), Image.LANCZOS)
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, image_format)
+    return SimpleUploadedFile(
+        upload.name, buffer.getvalue(), upload.content_type
+    )
+
+
 class PostForm(forms.ModelForm):
     class Meta:
         model = Post
         fields = ['group', 'text', 'image']
 
+    def __init__(self, *args, upload_errors=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Файлы, отброшенные обработчиком загрузки, до формы не доходят:
+        # причину он оставляет в запросе.
+        self.upload_errors = upload_errors or {}
+
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            image = downscale(image)
+            metadata = thumbnails.describe(image)
+        elif image is False:
+            metadata = thumbnails.NO_METADATA
+        else:
+            return image
+        # Этих полей нет в форме, и construct_instance их не заполнит.
+        for field, value in metadata.items():
+            setattr(self.instance, field, value)
+        return image
+
+    def clean(self):
+        cleaned_data = super().clean()
+        for field, message in self.upload_errors.items():
+            if field in self.fields:
+                self.add_error(field, message)
+        return cleaned_data
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,32 @@
+from core import holes
+
+from .forms import CommentForm
+from .models import Follow
+
+
+@holes.register('switcher', 'posts/includes/switcher.html')
+def switcher(request, **flags):
+    return flags
+
+
+@holes.register('follow_button', 'posts/includes/follow_button.html')
+def follow_button(request, username):
+    following = False
+    if request.user.is_authenticated and request.user.username != username:
+        if Follow.objects.filter(
+            user=request.user, author__username=username
+        ).exists():
+            following = 'can_unfollow'
+        else:
+            following = 'can_follow'
+    return {'username': username, 'following': following}
+
+
+@holes.register('edit_link', 'posts/includes/edit_link.html')
+def edit_link(request, post_id, author_id):
+    return {'post_id': post_id, 'can_edit': request.user.id == author_id}
+
+
+@holes.register('comment_form', 'posts/includes/comment_form.html')
+def comment_form(request, post_id):
+    return {'post_id': post_id, 'form': CommentForm()}
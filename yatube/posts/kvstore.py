@@ -0,0 +1,65 @@
+"""Хранилище ключей sorl-thumbnail с пакетной предвыборкой.
+
+Стандартный cached_db делает по запросу к кешу, а при промахе — к БД
+на каждое превью. Здесь ключи целой страницы выбираются заранее одним
+get_many и одним SELECT ... IN, а отдельные get берут готовое значение.
+"""
+import threading
+
+from sorl.thumbnail.conf import settings
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as CachedDBStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+
+class KVStore(CachedDBStore):
+
+    def __init__(self):
+        super().__init__()
+        # Хранилище — общий на процесс объект, а предвыборка относится
+        # к текущему запросу, поэтому держим её в локальной для потока.
+        self._local = threading.local()
+
+    @property
+    def _prefetched(self):
+        if not hasattr(self._local, 'values'):
+            self._local.values = {}
+        return self._local.values
+
+    def prefetch(self, keys):
+        """Загружает записи о превью с ключами keys одним пакетом."""
+        raw_keys = [add_prefix(key) for key in keys]
+        values = self.cache.get_many(raw_keys)
+        missed = [key for key in raw_keys if key not in values]
+        if missed:
+            found = dict(KVStoreModel.objects.filter(
+                key__in=missed
+            ).values_list('key', 'value'))
+            # Отсутствие записи тоже кешируем, как это делает cached_db.
+            loaded = {key: found.get(key, EMPTY_VALUE) for key in missed}
+            self.cache.set_many(loaded, settings.THUMBNAIL_CACHE_TIMEOUT)
+            values.update(loaded)
+        self._prefetched.update(values)
+
+    def clear_prefetched(self):
+        """Сбрасывает предвыборку: невостребованные записи не должны
+        дожить до следующего запроса этого потока."""
+        self._local.values = {}
+
+    def _get_raw(self, key):
+        value = self._prefetched.pop(key, None)
+        if value is None:
+            return super()._get_raw(key)
+        if value == EMPTY_VALUE:
+            return None
+        return value
+
+    def _set_raw(self, key, value):
+        self._prefetched.pop(key, None)
+        super()._set_raw(key, value)
+
+    def _delete_raw(self, *keys):
+        for key in keys:
+            self._prefetched.pop(key, None)
+        super()._delete_raw(*keys)
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts import feed
+
+
+class Command(BaseCommand):
+    help = (
+        'Возвращает к раскладке по лентам авторов, у которых подписчиков '
+        'стало меньше FEED_CELEBRITY_DEMOTE_THRESHOLD. Запускается '
+        'по расписанию, а не в запросе.'
+    )
+
+    def handle(self, *args, **options):
+        demoted = 0
+        for author_id in list(feed.demotion_candidates()):
+            demoted += feed.demote(author_id)
+        self.stdout.write(f'Возвращено к раскладке авторов: {demoted}')
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Пересоздаёт полнотекстовые индексы постов и комментариев.'
+
+    def handle(self, *args, **options):
+        if not search.available(connection):
+            self.stderr.write('Поиск работает только на SQLite с FTS5.')
+            return
+        search.rebuild(connection)
+        for index in search.INDEXES.values():
+            self.stdout.write(f'{index}: индекс пересобран')
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from posts.seed import Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу правдоподобными данными для замеров: степенное '
+        'авторство, граф подписок Барабаши — Альберт, комментарии и группы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument(
+            '--comments', type=float, default=3,
+            help='Среднее число комментариев к посту.',
+        )
+        parser.add_argument(
+            '--follows', type=int, default=10,
+            help='На скольких авторов подписывается новый пользователь.',
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней до сегодня распределены посты.',
+        )
+        parser.add_argument(
+            '--alpha', type=float, default=1.1,
+            help='Показатель степенного закона популярности.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        Seeder(
+            seed=options['seed'],
+            users=options['users'],
+            posts=options['posts'],
+            groups=options['groups'],
+            comments=options['comments'],
+            follows=options['follows'],
+            days=options['days'],
+            batch_size=options['batch_size'],
+            alpha=options['alpha'],
+            log=self.stdout.write,
+        ).run()
@@ -0,0 +1,70 @@
+# Generated by Django 2.2.16 on 2026-10-18 01:43
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Post = apps.get_model('posts', 'Post')
+    Group = apps.get_model('posts', 'Group')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+
+    def actual(source, fk):
+        return Coalesce(Subquery(
+            source.objects.filter(**{fk: OuterRef('pk')}).order_by().values(
+                fk
+            ).annotate(total=Count('pk')).values('total')
+        ), 0)
+
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=pk) for pk in User.objects.values_list('pk', flat=True)],
+        batch_size=1000,
+    )
+    Post.objects.update(comments_count=actual(Comment, 'post'))
+    Group.objects.update(posts_count=actual(Post, 'group'))
+    UserStats.objects.update(
+        posts_count=actual(Post, 'author'),
+        followers_count=actual(Follow, 'author'),
+        following_count=actual(Follow, 'user'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0008_post_updated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('posts_count', models.IntegerField(default=0, verbose_name='Число постов')),
+                ('followers_count', models.IntegerField(default=0, verbose_name='Число подписчиков')),
+                ('following_count', models.IntegerField(default=0, verbose_name='Число подписок')),
+            ],
+            options={
+                'verbose_name': 'Счётчики пользователя',
+                'verbose_name_plural': 'Счётчики пользователей',
+            },
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.IntegerField(default=0, verbose_name='Число постов'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.IntegerField(default=0, verbose_name='Число комментариев'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
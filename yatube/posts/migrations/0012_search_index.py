@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from posts import search
+
+
+def create_index(apps, schema_editor):
+    search.rebuild(schema_editor.connection)
+
+
+def drop_index(apps, schema_editor):
+    search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_post_image_metadata'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
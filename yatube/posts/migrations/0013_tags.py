@@ -0,0 +1,104 @@
+# Generated by Django 2.2.16 on 2026-10-18 01:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from posts.tags import parse_mentions, parse_tags
+
+
+def fill_tags(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Post = apps.get_model('posts', 'Post')
+    Tag = apps.get_model('posts', 'Tag')
+    PostTag = apps.get_model('posts', 'PostTag')
+    Mention = apps.get_model('posts', 'Mention')
+    posts = Post.objects.values_list('id', 'pub_date', 'text')
+    for post_id, pub_date, text in posts.iterator():
+        names = parse_tags(text)
+        usernames = parse_mentions(text)
+        if names:
+            Tag.objects.bulk_create(
+                [Tag(name=name) for name in names], ignore_conflicts=True
+            )
+            PostTag.objects.bulk_create([
+                PostTag(tag_id=tag_id, post_id=post_id, pub_date=pub_date)
+                for tag_id in Tag.objects.filter(
+                    name__in=names
+                ).values_list('id', flat=True)
+            ], ignore_conflicts=True)
+        if usernames:
+            Mention.objects.bulk_create([
+                Mention(user_id=user_id, post_id=post_id, pub_date=pub_date)
+                for user_id in User.objects.filter(
+                    username__in=usernames
+                ).values_list('id', flat=True)
+            ], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0012_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Название')),
+            ],
+            options={
+                'verbose_name': 'Хештег',
+                'verbose_name_plural': 'Хештеги',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PostTag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_tags', to='posts.Post', verbose_name='Пост')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_tags', to='posts.Tag', verbose_name='Хештег')),
+            ],
+            options={
+                'verbose_name': 'Пост хештега',
+                'verbose_name_plural': 'Посты хештегов',
+                'ordering': ['-pub_date', '-post'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Mention',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mentions', to='posts.Post', verbose_name='Пост')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mentions', to=settings.AUTH_USER_MODEL, verbose_name='Упомянутый')),
+            ],
+            options={
+                'verbose_name': 'Упоминание',
+                'verbose_name_plural': 'Упоминания',
+                'ordering': ['-pub_date', '-post'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='posttag',
+            index=models.Index(fields=['tag', '-pub_date', '-post'], name='post_tag_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='posttag',
+            constraint=models.UniqueConstraint(fields=('tag', 'post'), name='unique_post_tag'),
+        ),
+        migrations.AddIndex(
+            model_name='mention',
+            index=models.Index(fields=['user', '-pub_date', '-post'], name='mention_user_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='mention',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_mention'),
+        ),
+        migrations.RunPython(fill_tags, migrations.RunPython.noop),
+    ]
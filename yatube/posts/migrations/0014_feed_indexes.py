@@ -0,0 +1,55 @@
+# Generated by Django 2.2.16 on 2026-10-18 01:59
+
+from django.db import migrations, models
+from django.db.models import Exists, F, OuterRef
+
+
+def drop_invalid_follows(apps, schema_editor):
+    # Без удаления дублей и подписок на себя ограничения не создадутся.
+    Follow = apps.get_model('posts', 'Follow')
+    Follow.objects.filter(user=F('author')).delete()
+    earlier = Follow.objects.filter(
+        user=OuterRef('user'), author=OuterRef('author'), pk__lt=OuterRef('pk')
+    )
+    Follow.objects.annotate(duplicate=Exists(earlier)).filter(
+        duplicate=True
+    ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_tags'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-created', '-id'], name='comment_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-pub_date', '-id'], name='post_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date', '-id'], name='post_group_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='post_author_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userstats',
+            index=models.Index(fields=['followers_count'], name='stats_followers_count_idx'),
+        ),
+        migrations.RunPython(drop_invalid_follows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.CheckConstraint(check=models.Q(_negated=True, user=F('author')), name='prevent_self_follow'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_celebrities(apps, schema_editor):
+    # До этой миграции «звёзды» определялись по числу подписчиков при
+    # каждом чтении; их посты по лентам уже не раскладывались.
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.filter(
+        followers_count__gte=settings.FEED_CELEBRITY_THRESHOLD
+    ).update(celebrity=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='celebrity',
+            field=models.BooleanField(db_index=True, default=False, help_text='Не раскладываются по лентам подписчиков', verbose_name='Посты читаются на лету'),
+        ),
+        migrations.RunPython(mark_celebrities, migrations.RunPython.noop),
+    ]
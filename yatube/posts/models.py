@@ -18,6 +18,10 @@ class Group(models.Model):
     description = models.TextField(
         verbose_name='Описание'
     )
+    posts_count = models.IntegerField(
+        default=0,
+        verbose_name='Число постов'
+    )
 
     class Meta:
         verbose_name_plural = 'Группы'
@@ -36,6 +40,10 @@ class Post(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
     author = models.ForeignKey(
         User,
         verbose_name='Автор публикации',
@@ -57,11 +65,63 @@ class Post(models.Model):
         blank=True,
         null=True,
     )
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки',
+        blank=True,
+        null=True,
+        editable=False,
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки',
+        blank=True,
+        null=True,
+        editable=False,
+    )
+    image_color = models.CharField(
+        'Основной цвет картинки',
+        max_length=7,
+        blank=True,
+        default='',
+        editable=False,
+    )
+    image_placeholder = models.TextField(
+        'Заглушка картинки',
+        blank=True,
+        default='',
+        editable=False,
+    )
+    image_widths = models.CharField(
+        'Ширины вариантов картинки',
+        max_length=64,
+        blank=True,
+        default='',
+        editable=False,
+    )
+    comments_count = models.IntegerField(
+        default=0,
+        verbose_name='Число комментариев'
+    )
 
     class Meta:
         ordering = ["-pub_date"]
         verbose_name_plural = 'Посты'
         verbose_name = 'Пост'
+        # Ленты фильтруются по группе или автору и идут по (pub_date, id):
+        # с этими индексами страница — диапазонный просмотр без сортировки.
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -88,6 +148,12 @@ class Comment(CreatedModel):
         ordering = ['-created']
         verbose_name_plural = 'Комментарий'
         verbose_name = 'Комментарий'
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -110,10 +176,192 @@ class Follow(CreatedModel):
     class Meta:
         verbose_name_plural = 'Подписки'
         verbose_name = 'Подписки'
-        models.UniqueConstraint(
-            fields=['user', 'author'],
-            name='unique_follow'
-        )
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_follow'
+            ),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='prevent_self_follow'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.user} подписан на {self.author}'
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, которые поддерживаются при записи."""
+    user = models.OneToOneField(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts_count = models.IntegerField(
+        default=0,
+        verbose_name='Число постов'
+    )
+    followers_count = models.IntegerField(
+        default=0,
+        verbose_name='Число подписчиков'
+    )
+    following_count = models.IntegerField(
+        default=0,
+        verbose_name='Число подписок'
+    )
+    celebrity = models.BooleanField(
+        default=False,
+        db_index=True,
+        verbose_name='Посты читаются на лету',
+        help_text='Не раскладываются по лентам подписчиков',
+    )
+
+    class Meta:
+        verbose_name_plural = 'Счётчики пользователей'
+        verbose_name = 'Счётчики пользователя'
+        indexes = [
+            models.Index(
+                fields=['followers_count'],
+                name='stats_followers_count_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'Счётчики {self.user}'
+
+
+class FeedItem(models.Model):
+    """Запись ленты подписок, разложенная по читателям при публикации."""
+    user = models.ForeignKey(
+        User,
+        verbose_name='Читатель',
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+    )
+    post = models.ForeignKey(
+        Post,
+        verbose_name='Пост',
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+    )
+
+    class Meta:
+        ordering = ['-pub_date', '-post']
+        verbose_name_plural = 'Ленты подписок'
+        verbose_name = 'Запись ленты'
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='feed_user_pub_date_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_feed_item',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.post} в ленте {self.user}'
+
+
+class Tag(models.Model):
+    """Хештег из текста поста."""
+    name = models.CharField(
+        'Название',
+        max_length=50,
+        unique=True,
+    )
+
+    class Meta:
+        ordering = ['name']
+        verbose_name_plural = 'Хештеги'
+        verbose_name = 'Хештег'
+
+    def __str__(self):
+        return f'#{self.name}'
+
+
+class PostTag(models.Model):
+    """Пост в списке хештега; дата продублирована для курсорного обхода."""
+    tag = models.ForeignKey(
+        Tag,
+        verbose_name='Хештег',
+        on_delete=models.CASCADE,
+        related_name='post_tags',
+    )
+    post = models.ForeignKey(
+        Post,
+        verbose_name='Пост',
+        on_delete=models.CASCADE,
+        related_name='post_tags',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+    )
+
+    class Meta:
+        ordering = ['-pub_date', '-post']
+        verbose_name_plural = 'Посты хештегов'
+        verbose_name = 'Пост хештега'
+        indexes = [
+            models.Index(
+                fields=['tag', '-pub_date', '-post'],
+                name='post_tag_pub_date_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tag', 'post'],
+                name='unique_post_tag',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.post} с {self.tag}'
+
+
+class Mention(models.Model):
+    """Упоминание пользователя через @username в тексте поста."""
+    user = models.ForeignKey(
+        User,
+        verbose_name='Упомянутый',
+        on_delete=models.CASCADE,
+        related_name='mentions',
+    )
+    post = models.ForeignKey(
+        Post,
+        verbose_name='Пост',
+        on_delete=models.CASCADE,
+        related_name='mentions',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+    )
+
+    class Meta:
+        ordering = ['-pub_date', '-post']
+        verbose_name_plural = 'Упоминания'
+        verbose_name = 'Упоминание'
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='mention_user_pub_date_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_mention',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user} в {self.post}'
@@ -0,0 +1,173 @@
+"""Полнотекстовый поиск по постам и комментариям на SQLite FTS5.
+
+Индексы — FTS5-таблицы с внешним содержимым: текст хранится только
+в posts_post и posts_comment, а триггеры поддерживают индекс при любой
+записи, включая update() и bulk_create(). Пересборка при переделке
+таблицы в миграциях идёт через install() по сигналу post_migrate.
+"""
+import re
+
+from .models import Post
+
+# Таблица модели -> её FTS5-индекс.
+INDEXES = {
+    'posts_post': 'posts_post_fts',
+    'posts_comment': 'posts_comment_fts',
+}
+# Совпадение в комментарии весит меньше совпадения в тексте поста.
+COMMENT_WEIGHT = 0.5
+MAX_TERMS = 8
+
+INSTALL = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5(
+        text, content='{table}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS {index}_ai AFTER INSERT ON {table} BEGIN
+        INSERT INTO {index}(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS {index}_ad AFTER DELETE ON {table} BEGIN
+        INSERT INTO {index}({index}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS {index}_au AFTER UPDATE OF text ON {table}
+    BEGIN
+        INSERT INTO {index}({index}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {index}(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+)
+
+UNINSTALL = (
+    'DROP TRIGGER IF EXISTS {index}_ai',
+    'DROP TRIGGER IF EXISTS {index}_ad',
+    'DROP TRIGGER IF EXISTS {index}_au',
+    'DROP TABLE IF EXISTS {index}',
+)
+
+SEARCH = """
+SELECT post_id, MIN(rank) AS best FROM (
+    SELECT rowid AS post_id, bm25(posts_post_fts) AS rank
+    FROM posts_post_fts WHERE posts_post_fts MATCH %s
+    UNION ALL
+    SELECT comment.post_id, bm25(posts_comment_fts) * {weight} AS rank
+    FROM posts_comment_fts
+    JOIN posts_comment AS comment ON comment.id = posts_comment_fts.rowid
+    WHERE posts_comment_fts MATCH %s
+)
+GROUP BY post_id
+{having}
+ORDER BY best {direction}, post_id {direction}
+LIMIT %s
+"""
+# bm25 тем меньше, чем лучше совпадение: вглубь выдачи ранг растёт.
+HAVING = {
+    'lt': 'HAVING best > %s OR (best = %s AND post_id > %s)',
+    'gt': 'HAVING best < %s OR (best = %s AND post_id < %s)',
+}
+
+
+def available(connection):
+    return connection.vendor == 'sqlite'
+
+
+def _statements(templates):
+    for table, index in INDEXES.items():
+        for template in templates:
+            yield template.format(table=table, index=index)
+
+
+def install(connection):
+    """Создаёт индексы и триггеры, если их ещё нет."""
+    if not available(connection):
+        return
+    with connection.cursor() as cursor:
+        for statement in _statements(INSTALL):
+            cursor.execute(statement)
+
+
+def uninstall(connection):
+    if not available(connection):
+        return
+    with connection.cursor() as cursor:
+        for statement in _statements(UNINSTALL):
+            cursor.execute(statement)
+
+
+def rebuild(connection):
+    """Заново строит индексы по текущему содержимому таблиц."""
+    install(connection)
+    if not available(connection):
+        return
+    with connection.cursor() as cursor:
+        for index in INDEXES.values():
+            cursor.execute(
+                f"INSERT INTO {index}({index}) VALUES ('rebuild')"
+            )
+
+
+def to_match(query):
+    """Превращает пользовательский запрос в выражение MATCH.
+
+    Синтаксис FTS5 пользователю не доступен: каждое слово ищется как
+    префикс в кавычках, все слова должны встретиться.
+    """
+    terms = re.findall(r'\w+', query)[:MAX_TERMS]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+class SearchResults:
+    """Посты по запросу в порядке bm25 — источник для KeysetPaginator.
+
+    Ключ курсора — (rank, id); найденные посты получают атрибут rank.
+    """
+    model = Post
+    ordered = True
+
+    def __init__(self, query, connection):
+        self.match = to_match(query)
+        self.connection = connection
+
+    def parse_values(self, values):
+        rank, post_id = values
+        return [float(rank), int(post_id)]
+
+    def keyset_rows(self, values, lookup, limit):
+        if not self.match or not available(self.connection):
+            return []
+        params = [self.match, self.match]
+        having = ''
+        if values:
+            having = HAVING[lookup]
+            params += [values[0], values[0], values[1]]
+        sql = SEARCH.format(
+            weight=COMMENT_WEIGHT,
+            having=having,
+            direction='DESC' if lookup == 'gt' else 'ASC',
+        )
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params + [limit])
+            ranked = cursor.fetchall()
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [post_id for post_id, _ in ranked]
+        )
+        rows = []
+        for post_id, rank in ranked:
+            post = posts.get(post_id)
+            if post is not None:
+                post.rank = rank
+                rows.append(post)
+        return rows
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step:
+            raise TypeError('SearchResults supports only plain slices')
+        return self.keyset_rows(None, 'lt', index.stop)[index]
@@ -0,0 +1,266 @@
+"""Генератор большого правдоподобного набора данных для замеров.
+
+Авторство постов подчиняется степенному закону, подписки строятся
+как граф Барабаши — Альберт, всё пишется пачками bulk_create с заранее
+назначенными id. Сигналы при этом не срабатывают, поэтому счётчики
+и ленты пересобираются в конце, а закешированные страницы сбрасываются.
+"""
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+
+from . import counters, feed
+from .models import Comment, Follow, Group, Mention, Post, PostTag, Tag
+
+User = get_user_model()
+
+VOCABULARY_SIZE = 3000
+TAGS = 200
+TAG_PROBABILITY = 0.2
+MENTION_PROBABILITY = 0.05
+GROUP_PROBABILITY = 0.6
+
+
+@contextmanager
+def explicit_dates():
+    """Временно отключает auto_now/auto_now_add, чтобы даты шли из данных."""
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Post._meta.get_field('updated'),
+        Comment._meta.get_field('created'),
+        Follow._meta.get_field('created'),
+    ]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def next_id(model):
+    return (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+
+def zipf_weights(count, alpha):
+    """Накопленные веса рангов 1..count по закону Ципфа."""
+    return list(accumulate(1 / rank ** alpha for rank in range(1, count + 1)))
+
+
+class Seeder:
+    def __init__(self, seed=0, users=10000, posts=100000, groups=50,
+                 comments=3, follows=10, days=365, batch_size=5000,
+                 alpha=1.1, log=None):
+        self.rng = random.Random(seed)
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(seed)
+        self.users = users
+        self.posts = posts
+        self.groups = groups
+        self.comments = comments
+        self.follows = follows
+        self.batch_size = batch_size
+        self.alpha = alpha
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+        self.start = self.now - timedelta(days=days)
+
+    def save(self, model, objects):
+        """Пишет поток объектов пачками, каждая — в своей транзакции."""
+        objects = iter(objects)
+        saved = 0
+        while True:
+            batch = list(islice(objects, self.batch_size))
+            if not batch:
+                return saved
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+            saved += len(batch)
+
+    def run(self):
+        with explicit_dates():
+            self.seed_users()
+            self.seed_groups()
+            self.seed_tags()
+            self.seed_posts()
+            self.seed_follows()
+        self.log('Пересчёт счётчиков')
+        counters.reconcile(self.batch_size)
+        self.log('Раскладка лент подписок')
+        feed.mark_celebrities()
+        new_follows = Follow.objects.filter(pk__gte=self.first_follow)
+        with transaction.atomic():
+            for follow in new_follows.iterator():
+                feed.backfill(follow)
+        cache.clear()
+
+    def seed_users(self):
+        self.first_user = next_id(User)
+        password = make_password(None)
+        self.user_ids = list(
+            range(self.first_user, self.first_user + self.users)
+        )
+        self.save(User, (
+            User(
+                pk=pk,
+                username=f'seed_{pk}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                password=password,
+                date_joined=self.start,
+            )
+            for pk in self.user_ids
+        ))
+        # Популярность не совпадает с порядком регистрации.
+        self.ranked_users = self.user_ids[:]
+        self.rng.shuffle(self.ranked_users)
+        self.user_weights = zipf_weights(self.users, self.alpha)
+        self.log(f'Пользователей: {self.users}')
+
+    def seed_groups(self):
+        first = next_id(Group)
+        self.group_ids = list(range(first, first + self.groups))
+        self.save(Group, (
+            Group(
+                pk=pk,
+                title=self.fake.sentence(nb_words=3)[:200],
+                slug=f'seed-{pk}',
+                description=self.fake.sentence(),
+            )
+            for pk in self.group_ids
+        ))
+        self.group_weights = zipf_weights(self.groups, self.alpha)
+        self.log(f'Групп: {self.groups}')
+
+    def seed_tags(self):
+        self.words = [
+            self.fake.word().lower() for _ in range(VOCABULARY_SIZE)
+        ]
+        names = sorted(set(self.words))[:TAGS]
+        self.rng.shuffle(names)
+        Tag.objects.bulk_create(
+            [Tag(name=name) for name in names], ignore_conflicts=True
+        )
+        ids = dict(Tag.objects.filter(
+            name__in=names
+        ).values_list('name', 'pk'))
+        self.tags = [(name, ids[name]) for name in names]
+        self.tag_weights = zipf_weights(len(self.tags), self.alpha)
+
+    def pick_user(self):
+        return self.rng.choices(
+            self.ranked_users, cum_weights=self.user_weights
+        )[0]
+
+    def seed_posts(self):
+        """Посты вместе с их хештегами, упоминаниями и комментариями."""
+        post_id = next_id(Post)
+        comment_id = next_id(Comment)
+        step = (self.now - self.start) / max(self.posts, 1)
+        written = 0
+        while written < self.posts:
+            size = min(self.batch_size, self.posts - written)
+            authors = self.rng.choices(
+                self.ranked_users, cum_weights=self.user_weights, k=size
+            )
+            posts, post_tags, mentions, comments = [], [], [], []
+            for author_id in authors:
+                pub_date = self.start + step * (written + self.rng.random())
+                words = self.rng.choices(
+                    self.words, k=self.rng.randint(5, 60)
+                )
+                if self.rng.random() < TAG_PROBABILITY:
+                    name, tag_id = self.rng.choices(
+                        self.tags, cum_weights=self.tag_weights
+                    )[0]
+                    words.append(f'#{name}')
+                    post_tags.append(PostTag(
+                        tag_id=tag_id, post_id=post_id, pub_date=pub_date
+                    ))
+                if self.rng.random() < MENTION_PROBABILITY:
+                    mentioned = self.pick_user()
+                    words.append(f'@seed_{mentioned}')
+                    mentions.append(Mention(
+                        user_id=mentioned, post_id=post_id, pub_date=pub_date
+                    ))
+                group_id = None
+                if self.group_ids and self.rng.random() < GROUP_PROBABILITY:
+                    group_id = self.rng.choices(
+                        self.group_ids, cum_weights=self.group_weights
+                    )[0]
+                posts.append(Post(
+                    pk=post_id,
+                    author_id=author_id,
+                    group_id=group_id,
+                    text=' '.join(words).capitalize(),
+                    pub_date=pub_date,
+                    updated=pub_date,
+                ))
+                # Число комментариев — геометрическое со средним comments.
+                while self.rng.random() < self.comments / (self.comments + 1):
+                    created = min(
+                        pub_date + timedelta(hours=self.rng.expovariate(0.1)),
+                        self.now,
+                    )
+                    comments.append(Comment(
+                        pk=comment_id,
+                        post_id=post_id,
+                        author_id=self.pick_user(),
+                        text=self.fake.sentence(),
+                        created=created,
+                    ))
+                    comment_id += 1
+                post_id += 1
+                written += 1
+            with transaction.atomic():
+                Post.objects.bulk_create(posts)
+                PostTag.objects.bulk_create(post_tags)
+                Mention.objects.bulk_create(mentions, ignore_conflicts=True)
+                Comment.objects.bulk_create(comments)
+            self.log(f'Постов: {written} из {self.posts}')
+
+    def barabasi_albert(self):
+        """Рёбра (подписчик, автор): новый пользователь подписывается
+        на follows уже существующих с вероятностью, пропорциональной
+        их степени, — так получается граф без характерного масштаба."""
+        repeated = []
+        for index, user_id in enumerate(self.user_ids):
+            if index <= self.follows:
+                targets = set(self.user_ids[:index])
+            else:
+                targets = set()
+                while len(targets) < self.follows:
+                    targets.add(self.rng.choice(repeated))
+            for target in targets:
+                yield user_id, target
+            repeated.extend(targets)
+            repeated.extend([user_id] * len(targets))
+
+    def seed_follows(self):
+        self.first_follow = next_id(Follow)
+        span = (self.now - self.start).total_seconds()
+        saved = self.save(Follow, (
+            Follow(
+                pk=pk,
+                user_id=user_id,
+                author_id=author_id,
+                created=self.start + timedelta(
+                    seconds=self.rng.random() * span
+                ),
+            )
+            for pk, (user_id, author_id) in enumerate(
+                self.barabasi_albert(), self.first_follow
+            )
+        ))
+        self.log(f'Подписок: {saved}')
@@ -0,0 +1,196 @@
+from django.core.signals import request_finished
+from django.db import connections
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+from sorl.thumbnail import default
+
+from . import counters, feed, search, tags
+from .cache import bump_version
+from .models import Comment, Follow, Group, Post, User
+from .utils import COUNT_SCOPE
+
+
+@receiver([post_save, post_delete], sender=Post)
+@receiver([post_save, post_delete], sender=Follow)
+def invalidate_counts(sender, **kwargs):
+    bump_version(COUNT_SCOPE)
+
+
+@receiver(post_save, sender=Post)
+def push_to_feeds(sender, instance, created, **kwargs):
+    if created:
+        feed.push_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, **kwargs):
+    if created:
+        feed.backfill(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_feed(sender, instance, **kwargs):
+    feed.prune(instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_state(sender, instance, **kwargs):
+    # При смене группы пост должен пропасть со страницы старой группы,
+    # а счётчик постов — перейти к новой; хештеги разбираются заново,
+    # только если изменился текст.
+    old = Post.objects.filter(pk=instance.pk).values_list(
+        'group_id', 'group__slug', 'text'
+    ).first() if instance.pk else None
+    instance._old_group = old[:2] if old else None
+    instance._old_text = old[2] if old else None
+
+
+@receiver(post_save, sender=Post)
+def index_tags(sender, instance, created, **kwargs):
+    if created or getattr(instance, '_old_text', None) != instance.text:
+        tags.index_post(instance, created=created)
+
+
+@receiver([post_save, post_delete], sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    scopes = {
+        'posts',
+        f'post:{instance.pk}',
+        f'profile:{instance.author.username}',
+        f'author:{instance.author_id}',
+    }
+    old_group = getattr(instance, '_old_group', None)
+    for slug in (
+        old_group[1] if old_group else None,
+        instance.group.slug if instance.group_id else None,
+    ):
+        if slug:
+            scopes.add(f'group:{slug}')
+    bump_version(*scopes)
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def invalidate_comment_pages(sender, instance, **kwargs):
+    bump_version(f'post:{instance.post_id}')
+
+
+@receiver([post_save, post_delete], sender=Follow)
+def invalidate_follow_pages(sender, instance, **kwargs):
+    bump_version(
+        f'profile:{instance.author.username}', f'author:{instance.author_id}'
+    )
+
+
+@receiver([post_save, post_delete], sender=Group)
+def invalidate_group_pages(sender, instance, **kwargs):
+    bump_version(
+        'posts', f'group:{instance.slug}', f'group_cards:{instance.pk}'
+    )
+
+
+NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=User)
+def remember_old_name(sender, instance, update_fields=None, **kwargs):
+    # Вход пользователя сохраняет только last_login: имя не читаем.
+    if not instance.pk or (
+            update_fields is not None
+            and not set(update_fields) & set(NAME_FIELDS)):
+        instance._old_name = None
+        return
+    instance._old_name = User.objects.filter(pk=instance.pk).values_list(
+        *NAME_FIELDS
+    ).first()
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_pages(sender, instance, **kwargs):
+    # Имя автора есть в карточках всех его постов и на страницах, где
+    # они выводятся, хотя сами посты не менялись.
+    old = getattr(instance, '_old_name', None)
+    if old is None or old == tuple(
+            getattr(instance, field) for field in NAME_FIELDS):
+        return
+    slugs = Group.objects.filter(posts__author=instance).values_list(
+        'slug', flat=True
+    ).distinct()
+    bump_version(
+        'posts',
+        f'profile:{old[0]}',
+        f'profile:{instance.username}',
+        f'author:{instance.pk}',
+        f'author_cards:{instance.pk}',
+        *(f'group:{slug}' for slug in slugs),
+    )
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_user(instance.author_id, posts_count=1)
+        if instance.group_id:
+            counters.bump(Group, instance.group_id, posts_count=1)
+        return
+    old_group = getattr(instance, '_old_group', None)
+    if old_group and old_group[0] != instance.group_id:
+        if old_group[0]:
+            counters.bump(Group, old_group[0], posts_count=-1)
+        if instance.group_id:
+            counters.bump(Group, instance.group_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, posts_count=-1)
+    if instance.group_id:
+        counters.bump(Group, instance.group_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.bump(Post, instance.post_id, comments_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.bump(Post, instance.post_id, comments_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def count_saved_follow(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_user(instance.author_id, followers_count=1)
+        counters.bump_user(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, followers_count=-1)
+    counters.bump_user(instance.user_id, following_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def update_celebrity(sender, instance, created, **kwargs):
+    # После счётчиков: порог сверяется с уже обновлённым числом.
+    if created:
+        feed.follow_changed(instance.author_id)
+
+
+@receiver(post_migrate)
+def install_search_index(sender, using, **kwargs):
+    # SQLite переделывает таблицу при изменении полей и теряет её триггеры:
+    # после любой миграции возвращаем их на место.
+    if sender.name != 'posts':
+        return
+    connection = connections[using]
+    if 'posts_post' in connection.introspection.table_names():
+        search.install(connection)
+
+
+@receiver(request_finished)
+def clear_thumbnail_prefetch(sender, **kwargs):
+    if hasattr(default.kvstore, 'clear_prefetched'):
+        default.kvstore.clear_prefetched()
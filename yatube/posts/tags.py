@@ -0,0 +1,88 @@
+"""Хештеги и упоминания: разбор текста при записи, выборка по индексу.
+
+Текст поста разбирается один раз при сохранении, а страницы хештегов
+и упоминаний читают готовые списки по индексу (ключ, pub_date, post)
+вместо LIKE по всей таблице постов.
+"""
+import re
+
+from django.contrib.auth import get_user_model
+
+from .models import Mention, Post, PostTag, Tag
+from .utils import keyset_rows
+
+User = get_user_model()
+
+TAG_RE = re.compile(r'(?<![\w#&])#(\w{1,50})')
+# Имя пользователя не заканчивается точкой: это конец предложения.
+MENTION_RE = re.compile(r'(?<![\w@])@([\w.@+-]{0,149}[\w+-])')
+
+
+def parse_tags(text):
+    return {name.lower() for name in TAG_RE.findall(text)}
+
+
+def parse_mentions(text):
+    return set(MENTION_RE.findall(text))
+
+
+def index_post(post, created=False):
+    """Приводит хештеги и упоминания поста в соответствие с текстом."""
+    names = parse_tags(post.text)
+    usernames = parse_mentions(post.text)
+    if not created:
+        PostTag.objects.filter(post=post).exclude(
+            tag__name__in=names
+        ).delete()
+        Mention.objects.filter(post=post).exclude(
+            user__username__in=usernames
+        ).delete()
+    if names:
+        Tag.objects.bulk_create(
+            [Tag(name=name) for name in names], ignore_conflicts=True
+        )
+        PostTag.objects.bulk_create(
+            [
+                PostTag(tag_id=tag_id, post=post, pub_date=post.pub_date)
+                for tag_id in Tag.objects.filter(
+                    name__in=names
+                ).values_list('pk', flat=True)
+            ],
+            ignore_conflicts=True,
+        )
+    if usernames:
+        Mention.objects.bulk_create(
+            [
+                Mention(user_id=user_id, post=post, pub_date=post.pub_date)
+                for user_id in User.objects.filter(
+                    username__in=usernames
+                ).values_list('pk', flat=True)
+            ],
+            ignore_conflicts=True,
+        )
+
+
+class IndexedPosts:
+    """Посты из строк индекса (хештега или упоминаний) для пагинатора.
+
+    Строки индекса уже упорядочены по (pub_date, post), поэтому
+    страница — один диапазонный просмотр без обращения к posts_post
+    за фильтрацией.
+    """
+    model = Post
+    ordered = True
+
+    def __init__(self, rows):
+        self.rows = rows.select_related('post__author', 'post__group')
+
+    def keyset_rows(self, values, lookup, limit):
+        return [
+            row.post for row in keyset_rows(
+                self.rows, ('pub_date', 'post_id'), values, lookup, limit
+            )
+        ]
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step:
+            raise TypeError('IndexedPosts supports only plain slices')
+        return self.keyset_rows(None, 'lt', index.stop)[index]
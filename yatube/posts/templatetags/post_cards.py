@@ -0,0 +1,68 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core import metrics
+from posts import thumbnails
+from posts.cache import get_versions
+
+register = template.Library()
+
+CARD_KEY = 'post_card:{}:{}:{}:{}:{:d}{:d}'
+
+
+def card_scopes(post):
+    """Области, чьи данные попадают в карточку помимо самого поста."""
+    scopes = [f'author_cards:{post.author_id}']
+    if post.group_id:
+        scopes.append(f'group_cards:{post.group_id}')
+    return scopes
+
+
+def card_key(post, show_group_link, show_profile_link, versions=None):
+    # Время изменения в ключе: правка поста делает недостижимой только
+    # его карточку, остальные записи ленты остаются в кеше. Имя автора
+    # и название группы меняются без правки поста — их версии тоже здесь.
+    if versions is None:
+        versions = get_versions(*card_scopes(post))
+    return CARD_KEY.format(
+        post.pk, post.updated.timestamp(),
+        versions[f'author_cards:{post.author_id}'],
+        versions.get(f'group_cards:{post.group_id}', ''),
+        show_group_link, show_profile_link,
+    )
+
+
+@register.simple_tag
+def post_cards(posts, show_group_link=False, show_profile_link=False):
+    """Возвращает HTML карточек постов, забирая готовые одним get_many."""
+    posts = list(posts)
+    versions = get_versions(*{
+        scope for post in posts for scope in card_scopes(post)
+    })
+    keys = [
+        card_key(post, show_group_link, show_profile_link, versions)
+        for post in posts
+    ]
+    cards = cache.get_many(keys)
+    metrics.CACHE_REQUESTS.inc(len(cards), cache='post_card', result='hit')
+    metrics.CACHE_REQUESTS.inc(
+        len(keys) - len(cards), cache='post_card', result='miss'
+    )
+    missed = {}
+    thumbnails.prefetch(
+        post.image for key, post in zip(keys, posts) if key not in cards
+    )
+    for key, post in zip(keys, posts):
+        if key not in cards:
+            missed[key] = render_to_string('includes/post.html', {
+                'post': post,
+                'show_group_link': show_group_link,
+                'show_profile_link': show_profile_link,
+            })
+    if missed:
+        cache.set_many(missed, settings.POST_CARD_CACHE_TIMEOUT)
+        cards.update(missed)
+    return [mark_safe(cards[key]) for key in keys]
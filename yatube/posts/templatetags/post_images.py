@@ -0,0 +1,21 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def thumbnail_url(image, alias):
+    return thumbnails.thumbnail_url(image, alias)
+
+
+@register.simple_tag
+def image_sources(post):
+    return thumbnails.image_sources(post)
+
+
+@register.simple_tag
+def image_size(post, alias, url):
+    width, height = thumbnails.display_size(post, alias, url)
+    return {'width': width, 'height': height}
@@ -0,0 +1,24 @@
+from django import template
+from django.urls import reverse
+from django.utils.html import conditional_escape, format_html
+from django.utils.safestring import mark_safe
+
+from posts.tags import MENTION_RE, TAG_RE
+
+register = template.Library()
+
+
+@register.filter(needs_autoescape=True)
+def tag_links(text, autoescape=True):
+    """Превращает #хештеги и @упоминания в ссылки."""
+    if autoescape:
+        text = conditional_escape(text)
+    text = TAG_RE.sub(lambda match: format_html(
+        '<a href="{}">#{}</a>',
+        reverse('posts:tag_list', args=[match[1].lower()]), match[1]
+    ), text)
+    text = MENTION_RE.sub(lambda match: format_html(
+        '<a href="{}">@{}</a>',
+        reverse('posts:profile', args=[match[1]]), match[1]
+    ), text)
+    return mark_safe(text)
@@ -0,0 +1,60 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются вместе с постами, комментариями и подписками."""
+        post = Post.objects.create(
+            author=self.author, text='Тестовый пост', group=self.group)
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 1)
+        post.group = None
+        post.save()
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        post.delete()
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 0)
+
+    def test_reconcile_fixes_drift(self):
+        """Команда reconcile_counters исправляет разошедшиеся счётчики."""
+        post = Post.objects.create(author=self.author, text='Тестовый пост')
+        Post.objects.filter(pk=post.pk).update(comments_count=42)
+        UserStats.objects.filter(user=self.author).delete()
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 1)
+        self.assertIn(
+            'Post.comments_count: исправлено строк 1', out.getvalue())
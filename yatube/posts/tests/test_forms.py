@@ -1,5 +1,8 @@
 import shutil
 import tempfile
+from io import BytesIO
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
 from django.core.cache import cache
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase, override_settings
@@ -8,6 +11,9 @@ from posts.models import Group, Post, Comment
 from http import HTTPStatus
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.conf import settings
+from PIL import Image
+from posts import thumbnails
+from sorl.thumbnail import default
 
 
 User = get_user_model()
@@ -125,6 +131,229 @@ class PostFormTests(TestCase):
         self.assertEqual(Post.objects.count(), post_count)
         self.assertEqual(response.status_code, HTTPStatus.OK)
 
+    @override_settings(POST_THUMBNAIL_WORKERS=0)
+    def test_thumbnails_generated_on_upload(self):
+        """Превью нарезаются при загрузке, шаблон берёт готовый адрес."""
+        buffer = BytesIO()
+        Image.new('RGB', (40, 20), 'red').save(buffer, 'PNG')
+        uploaded = SimpleUploadedFile(
+            name='thumb.png',
+            content=buffer.getvalue(),
+            content_type='image/png'
+        )
+        with mock.patch.object(
+            thumbnails.transaction, 'on_commit', lambda func: func()
+        ):
+            self.authorized_client.post(
+                reverse('posts:create'),
+                data={'text': 'С картинкой', 'image': uploaded},
+            )
+        post = Post.objects.latest('id')
+        urls = cache.get(thumbnails.urls_key(post.image.name))
+        self.assertIn('card', urls)
+        with mock.patch.object(thumbnails, 'get_thumbnail') as sorl:
+            self.assertEqual(
+                thumbnails.thumbnail_url(post.image, 'card'), urls['card']
+            )
+        sorl.assert_not_called()
+
+    @override_settings(POST_THUMBNAIL_WORKERS=0)
+    def test_responsive_variants_generated_on_upload(self):
+        """Рядом с картинкой появляются варианты для srcset."""
+        buffer = BytesIO()
+        Image.new('RGB', (700, 300), 'green').save(buffer, 'PNG')
+        uploaded = SimpleUploadedFile('wide.png', buffer.getvalue())
+        with mock.patch.object(
+            thumbnails.transaction, 'on_commit', lambda func: func()
+        ):
+            self.authorized_client.post(
+                reverse('posts:create'),
+                data={'text': 'Широкая картинка', 'image': uploaded},
+            )
+        post = Post.objects.latest('id')
+        self.assertEqual(post.image_widths, '320,640')
+        webp = thumbnails.variant_name(post.image.name, 640, 'webp')
+        self.assertTrue(post.image.storage.exists(webp))
+        sources = thumbnails.image_sources(post)
+        self.assertEqual(
+            [source['type'] for source in sources],
+            ['image/webp', 'image/jpeg']
+        )
+        self.assertIn(post.image.storage.url(webp) + ' 640w',
+                      sources[0]['srcset'])
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        self.assertContains(response, '<source type="image/webp"')
+
+    @override_settings(POST_THUMBNAIL_WORKERS=1)
+    def test_broken_pool_recreated(self):
+        """Пул с погибшим воркером пересоздаётся, пост сохраняется."""
+        broken = mock.Mock()
+        broken.submit.side_effect = BrokenProcessPool
+        fresh = mock.Mock()
+        buffer = BytesIO()
+        Image.new('RGB', (40, 20), 'red').save(buffer, 'PNG')
+        uploaded = SimpleUploadedFile('pool.png', buffer.getvalue())
+        with mock.patch.object(thumbnails, '_executor', broken), \
+                mock.patch.object(
+                    thumbnails, 'ProcessPoolExecutor', return_value=fresh), \
+                mock.patch.object(
+                    thumbnails.transaction, 'on_commit', lambda func: func()):
+            response = self.authorized_client.post(
+                reverse('posts:create'),
+                data={'text': 'Сломанный пул', 'image': uploaded},
+            )
+            self.assertIs(thumbnails._executor, fresh)
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        broken.shutdown.assert_called_once_with(wait=False)
+        fresh.submit.assert_called_once()
+
+    @override_settings(POST_THUMBNAIL_WORKERS=1)
+    def test_thumbnail_failure_not_raised_into_view(self):
+        """Отказ пула не превращает сохранённый пост в ошибку 500."""
+        buffer = BytesIO()
+        Image.new('RGB', (40, 20), 'red').save(buffer, 'PNG')
+        uploaded = SimpleUploadedFile('dead.png', buffer.getvalue())
+        with mock.patch.object(
+                thumbnails, '_get_executor', side_effect=BrokenProcessPool), \
+                mock.patch.object(
+                    thumbnails.transaction, 'on_commit', lambda func: func()):
+            response = self.authorized_client.post(
+                reverse('posts:create'),
+                data={'text': 'Без превью', 'image': uploaded},
+            )
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertTrue(Post.objects.filter(text='Без превью').exists())
+
+    def test_upload_limits(self):
+        """Лишние байты и пиксели отсекаются ещё при приёме файла."""
+        buffer = BytesIO()
+        Image.new('RGB', (40, 20), 'red').save(buffer, 'PNG')
+        post_count = Post.objects.count()
+        limits = (
+            {'IMAGE_UPLOAD_MAX_BYTES': 10},
+            {'IMAGE_UPLOAD_MAX_PIXELS': 100},
+        )
+        for limit in limits:
+            with self.subTest(limit=limit), override_settings(**limit):
+                response = self.authorized_client.post(
+                    reverse('posts:create'),
+                    data={
+                        'text': 'Слишком большая',
+                        'image': SimpleUploadedFile(
+                            'big.png', buffer.getvalue()
+                        ),
+                    },
+                )
+                self.assertTrue(response.context['form'].errors['image'])
+        self.assertEqual(Post.objects.count(), post_count)
+
+    @override_settings(POST_IMAGE_MAX_SIDE=16)
+    def test_large_original_downscaled(self):
+        """Оригинал больше допустимой стороны уменьшается при загрузке."""
+        buffer = BytesIO()
+        Image.new('RGB', (40, 20), 'red').save(buffer, 'JPEG')
+        self.authorized_client.post(
+            reverse('posts:create'),
+            data={
+                'text': 'Уменьшенная',
+                'image': SimpleUploadedFile('large.jpg', buffer.getvalue()),
+            },
+        )
+        post = Post.objects.latest('id')
+        with Image.open(post.image) as image:
+            self.assertEqual(image.size, (16, 8))
+
+    def test_image_metadata_stored(self):
+        """Размеры, цвет и заглушка картинки сохраняются в посте."""
+        buffer = BytesIO()
+        Image.new('RGB', (40, 20), (255, 0, 0)).save(buffer, 'PNG')
+        self.authorized_client.post(
+            reverse('posts:create'),
+            data={
+                'text': 'С метаданными',
+                'image': SimpleUploadedFile('meta.png', buffer.getvalue()),
+            },
+        )
+        post = Post.objects.latest('id')
+        self.assertEqual((post.image_width, post.image_height), (40, 20))
+        self.assertEqual(post.image_color, '#ff0000')
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/jpeg;base64,')
+        )
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, post.image_placeholder)
+
+    def test_thumbnails_prefetched_in_one_query(self):
+        """Записи sorl для всей страницы выбираются одним запросом."""
+        images = []
+        for name in ('first.png', 'second.png'):
+            buffer = BytesIO()
+            Image.new('RGB', (40, 20), 'blue').save(buffer, 'PNG')
+            post = Post.objects.create(
+                author=self.user,
+                text='С картинкой',
+                image=SimpleUploadedFile(name, buffer.getvalue()),
+            )
+            thumbnails.thumbnail(post.image, 'card')
+            images.append(Post.objects.get(pk=post.pk).image)
+        cache.clear()
+        with self.assertNumQueries(1):
+            thumbnails.prefetch(images)
+        with self.assertNumQueries(0):
+            for image in images:
+                self.assertTrue(thumbnails.thumbnail_url(image, 'card'))
+
+    def test_missing_thumbnail_not_rendered_in_request(self):
+        """Пока превью не готово, отдаётся исходник без нарезки."""
+        buffer = BytesIO()
+        Image.new('RGB', (40, 20), 'blue').save(buffer, 'PNG')
+        post = Post.objects.create(
+            author=self.user,
+            text='С картинкой',
+            image=SimpleUploadedFile('pending.png', buffer.getvalue()),
+        )
+        cache.clear()
+        with mock.patch('posts.thumbnails.get_thumbnail') as get_thumbnail:
+            url = thumbnails.thumbnail_url(post.image, 'card')
+        get_thumbnail.assert_not_called()
+        self.assertEqual(url, post.image.url)
+
+    def test_original_fallback_keeps_proportions(self):
+        """Исходник вместо превью выводится со своими размерами."""
+        buffer = BytesIO()
+        Image.new('RGB', (40, 20), 'blue').save(buffer, 'PNG')
+        self.authorized_client.post(
+            reverse('posts:create'),
+            data={
+                'text': 'Исходник',
+                'image': SimpleUploadedFile('wide.png', buffer.getvalue()),
+            },
+        )
+        post = Post.objects.get(text='Исходник')
+        cache.clear()
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        self.assertContains(response, f'src="{post.image.url}"')
+        self.assertContains(response, 'width="40" height="20"')
+
+    def test_prefetch_cleared_after_request(self):
+        """Невостребованная предвыборка не переживает запрос."""
+        buffer = BytesIO()
+        Image.new('RGB', (40, 20), 'blue').save(buffer, 'PNG')
+        post = Post.objects.create(
+            author=self.user,
+            text='С картинкой',
+            image=SimpleUploadedFile('unused.png', buffer.getvalue()),
+        )
+        cache.clear()
+        thumbnails.prefetch([post.image])
+        self.assertTrue(default.kvstore._prefetched)
+        self.client.get(reverse('about:author'))
+        self.assertFalse(default.kvstore._prefetched)
+
 
 class CommentFormTests(TestCase):
     @classmethod
@@ -0,0 +1,123 @@
+import re
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+# Просмотр таблицы целиком: SCAN без индекса. Обход по индексу,
+# виртуальные таблицы FTS5 и подзапросы сюда не попадают.
+FULL_SCAN_RE = re.compile(
+    r'^SCAN (?!CONSTANT ROW)(?!\()(?!.* USING )(?!.*VIRTUAL)'
+)
+TEMP_SORT = 'USE TEMP B-TREE'
+# Форма поста выводит выпадающий список всех групп — это намеренно.
+# SQLite до 3.36 пишет в плане SCAN TABLE вместо SCAN.
+ALLOWED_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?posts_group$')
+
+
+class QueryPlansTest(TestCase):
+    """EXPLAIN QUERY PLAN для запросов каждого представления."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author,
+                group=cls.group,
+                text=f'Пост #план номер {i} для @reader',
+            )
+            for i in range(settings.NUMBER_POST + 2)
+        ]
+        cls.post = cls.posts[-1]
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий'
+        )
+        # Читатель «звезды»: её посты подмешиваются в ленту при чтении.
+        cls.star = User.objects.create_user(username='star')
+        cls.fan = User.objects.create_user(username='fan')
+        UserStats.objects.create(user=cls.star, celebrity=True)
+        Follow.objects.create(user=cls.fan, author=cls.author)
+        Follow.objects.create(user=cls.fan, author=cls.star)
+        for i in range(settings.NUMBER_POST + 2):
+            Post.objects.create(author=cls.star, text=f'Пост звезды {i}')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def urls(self):
+        post_kwargs = {'post_id': self.post.pk}
+        profile_kwargs = {'username': self.author.username}
+        index = reverse('posts:index')
+        next_cursor = self.client.get(index).context['page_obj'].next_cursor
+        return [
+            index,
+            index + '?page=2',
+            index + f'?after={next_cursor}',
+            index + f'?before={next_cursor}',
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs=profile_kwargs),
+            reverse('posts:post_detail', kwargs=post_kwargs),
+            reverse('posts:comments', kwargs=post_kwargs),
+            reverse('posts:edit', kwargs=post_kwargs),
+            reverse('posts:create'),
+            reverse('posts:follow_index'),
+            reverse('posts:follow_index') + f'?after={next_cursor}',
+            reverse('posts:search') + '?q=план',
+            reverse('posts:tag_list', kwargs={'name': 'план'}),
+            reverse('posts:mentions', kwargs={'username': 'reader'}),
+        ]
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertPlansUseIndexes(self, client, urls):
+        for url in urls:
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                client.get(url)
+            for query in context.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT'):
+                    continue
+                for detail in self.explain(sql):
+                    with self.subTest(url=url, sql=sql, plan=detail):
+                        if not ALLOWED_SCAN_RE.match(detail):
+                            self.assertIsNone(FULL_SCAN_RE.match(detail))
+                        if 'posts_post_fts' not in sql:
+                            self.assertNotIn(TEMP_SORT, detail)
+
+    def test_no_full_scans_or_temp_sorts(self):
+        """Запросы страниц идут по индексам и не сортируют во временном
+        B-дереве (кроме ранжирования поиска)."""
+        self.assertPlansUseIndexes(self.client, self.urls())
+
+    def test_celebrity_feed_plans(self):
+        """Лента с подпиской на «звезду» тоже не сортирует всё подряд."""
+        client = Client()
+        client.force_login(self.fan)
+        url = reverse('posts:follow_index')
+        next_cursor = client.get(url).context['page_obj'].next_cursor
+        self.assertPlansUseIndexes(client, [
+            url, url + '?page=2', url + f'?after={next_cursor}',
+        ])
@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='searcher')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def found(self, query, **params):
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+        return response, [post.pk for post in response.context['page_obj']]
+
+    def test_index_follows_writes(self):
+        """Индекс обновляется триггерами, даже в обход сигналов."""
+        post = Post.objects.create(author=self.user, text='Рыжий кот')
+        commented = Post.objects.create(author=self.user, text='Без слов')
+        Comment.objects.create(
+            post=commented, author=self.user, text='Котики'
+        )
+        self.assertEqual(self.found('кот')[1], [post.pk, commented.pk])
+        Post.objects.filter(pk=post.pk).update(text='Серый пёс')
+        self.assertEqual(self.found('кот')[1], [commented.pk])
+        self.assertEqual(self.found('пёс')[1], [post.pk])
+        post.delete()
+        self.assertEqual(self.found('пёс')[1], [])
+
+    def test_cursor_pages(self):
+        """Выдача листается курсором без повторов и пропусков."""
+        Post.objects.bulk_create([
+            Post(author=self.user, text=f'Заметка номер {i}')
+            for i in range(settings.NUMBER_POST + 3)
+        ])
+        response, first = self.found('заметка')
+        self.assertEqual(len(first), settings.NUMBER_POST)
+        cursor = response.context['page_obj'].next_cursor
+        self.assertContains(response, f'after={cursor}')
+        response, second = self.found('заметка', after=cursor)
+        self.assertEqual(len(second), 3)
+        # Все ссылки пагинатора сохраняют запрос.
+        self.assertContains(response, 'href="?q=%D0%B7%D0%B0%D0%BC')
+        self.assertNotContains(response, 'href="?page=')
+        self.assertCountEqual(
+            first + second, Post.objects.values_list('pk', flat=True)
+        )
+        before = response.context['page_obj'].previous_cursor
+        self.assertEqual(self.found('заметка', before=before)[1], first)
+
+    def test_query_is_not_fts_syntax(self):
+        """Операторы FTS5 в запросе не ломают поиск."""
+        Post.objects.create(author=self.user, text='Кавычки "и" звёзды')
+        response, found = self.found('"звёзды* -(')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(found), 1)
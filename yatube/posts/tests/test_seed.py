@@ -0,0 +1,56 @@
+from collections import Counter
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import F
+from django.test import TestCase
+
+from ..models import Comment, FeedItem, Follow, Post, UserStats
+from ..seed import Seeder
+
+
+class SeedTest(TestCase):
+    def fingerprint(self):
+        return (
+            list(Post.objects.order_by('pk').values_list(
+                'pk', 'author_id', 'group_id', 'text'
+            )),
+            list(Follow.objects.order_by('pk').values_list(
+                'user_id', 'author_id'
+            )),
+            Comment.objects.count(),
+        )
+
+    def test_seed_dataset(self):
+        """Команда наполняет базу и пересобирает счётчики и ленты."""
+        call_command(
+            'seed_yatube', users=60, posts=600, groups=5, follows=3,
+            batch_size=100, stdout=StringIO(),
+        )
+        self.assertEqual(Post.objects.count(), 600)
+        self.assertEqual(Follow.objects.count(), 3 * 60 - 6)
+        self.assertTrue(Comment.objects.exists())
+        self.assertFalse(
+            Follow.objects.filter(user_id=F('author_id')).exists()
+        )
+        posts = Counter(Post.objects.values_list('author_id', flat=True))
+        top = posts.most_common(1)[0][1]
+        self.assertGreater(top, 600 / 60 * 5, 'Авторство не степенное')
+        stats = UserStats.objects.get(user_id=posts.most_common(1)[0][0])
+        self.assertEqual(stats.posts_count, top)
+        self.assertTrue(FeedItem.objects.exists())
+        post = Post.objects.order_by('pk').last()
+        self.assertEqual(post.comments_count, post.comments.count())
+
+    def test_seed_reproducible(self):
+        """Одинаковый seed даёт одинаковые данные."""
+        runs = []
+        for _ in range(2):
+            with transaction.atomic():
+                Seeder(seed=7, users=30, posts=200, groups=3, follows=2,
+                       batch_size=50).run()
+                runs.append(self.fingerprint())
+                transaction.set_rollback(True)
+        self.assertEqual(runs[0], runs[1])
+        self.assertFalse(Post.objects.exists())
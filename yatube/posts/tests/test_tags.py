@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Mention, Post, PostTag
+
+User = get_user_model()
+
+
+class TagsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_tags_parsed_on_write(self):
+        """Хештеги и упоминания разбираются при создании и правке."""
+        post = Post.objects.create(
+            author=self.author,
+            text='#Django и #python, привет @reader. Почта a@b.c и &#39;',
+        )
+        self.assertCountEqual(
+            PostTag.objects.filter(post=post).values_list(
+                'tag__name', flat=True
+            ),
+            ['django', 'python'],
+        )
+        self.assertTrue(
+            Mention.objects.filter(post=post, user=self.reader).exists()
+        )
+        post.text = 'Только #python'
+        post.save()
+        self.assertEqual(
+            list(PostTag.objects.filter(post=post).values_list(
+                'tag__name', flat=True
+            )),
+            ['python'],
+        )
+        self.assertFalse(Mention.objects.filter(post=post).exists())
+
+    def test_tag_page_cursor(self):
+        """Страница хештега листается курсором по индексу."""
+        posts = [
+            Post.objects.create(author=self.author, text=f'#Новости {i}')
+            for i in range(settings.NUMBER_POST + 2)
+        ]
+        url = reverse('posts:tag_list', kwargs={'name': 'новости'})
+        response = self.guest_client.get(url)
+        first = list(response.context['page_obj'])
+        self.assertEqual(first, posts[::-1][:settings.NUMBER_POST])
+        self.assertContains(
+            response, f'href="{url}">#Новости</a>', html=False
+        )
+        response = self.guest_client.get(
+            url, {'after': response.context['page_obj'].next_cursor}
+        )
+        self.assertEqual(
+            list(response.context['page_obj']),
+            posts[::-1][settings.NUMBER_POST:]
+        )
+
+    def test_mentions_page(self):
+        """На странице упоминаний — посты с @username."""
+        post = Post.objects.create(author=self.author, text='Спасибо @reader')
+        Post.objects.create(author=self.author, text='Без упоминаний')
+        response = self.guest_client.get(
+            reverse('posts:mentions', kwargs={'username': 'reader'})
+        )
+        self.assertEqual(list(response.context['page_obj']), [post])
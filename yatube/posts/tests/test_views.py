@@ -1,10 +1,21 @@
+import re
 from datetime import datetime
+from io import StringIO
 from django import forms
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
-from posts.models import Group, Post, Follow
+from posts.models import Comment, FeedItem, Group, Post, Follow, UserStats
 from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from core.nplusone import NPlusOneTestMixin
+from posts import feed
+from posts.cache import get_versions
+from posts.templatetags.post_cards import card_key
+from posts.utils import CachedCountPaginator
 User = get_user_model()
 
 
@@ -67,15 +78,59 @@ class PagesTests(TestCase):
             author=self.user)
         content_one = self.authorized_client.get(
             reverse('posts:index')).content
-        post.delete()
+        Post.objects.filter(pk=post.pk).update(text='Без сигналов')
         content_two = self.authorized_client.get(
             reverse('posts:index')).content
         self.assertEqual(content_one, content_two)
-        cache.clear()
+        post.delete()
         content_three = self.authorized_client.get(
             reverse('posts:index')).content
         self.assertNotEqual(content_one, content_three)
 
+    def test_cache_invalidated_by_signals(self):
+        """Запись поста сразу сбрасывает кеш связанных страниц."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test_slug'}),
+            reverse('posts:profile', kwargs={'username': 'Test_Author'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+        for url in urls:
+            self.guest_client.get(url)
+        self.post.text = 'Изменённый пост'
+        self.post.group = self.group
+        self.post.save()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, 'Изменённый пост')
+
+    def test_post_page_cache_hit_without_queries(self):
+        """Попадание в кеш страницы поста не ходит в БД, а новый пост
+        автора всё равно её сбрасывает."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.guest_client.get(url)
+        with self.assertNumQueries(0):
+            self.guest_client.get(url)
+        Post.objects.create(text='Ещё пост', author=self.user)
+        response = self.guest_client.get(url)
+        self.assertEqual(
+            response.context['post'].author.stats.posts_count, 2
+        )
+
+    def test_shared_cache_personal_holes(self):
+        """Общая копия страницы дорисовывается под каждого посетителя."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        edit_url = reverse('posts:edit', kwargs={'post_id': self.post.pk})
+        author_page = self.authorized_client.get(url)
+        guest_page = self.guest_client.get(url)
+        self.assertContains(author_page, 'Test_Author')
+        self.assertContains(author_page, edit_url)
+        self.assertNotContains(guest_page, 'Пользователь: Test_Author')
+        self.assertNotContains(guest_page, edit_url)
+        self.assertNotContains(guest_page, '<!--hole:')
+        self.assertNotIn('post', guest_page.context)
+
 
 class PostsPagesTests(TestCase):
     @classmethod
@@ -120,6 +175,57 @@ class PostsPagesTests(TestCase):
                 self.assertEqual(post_group_0, self.posts.group.title)
                 self.assertIsInstance(post_date_0, datetime)
 
+    def test_post_card_cache(self):
+        """Правка поста сбрасывает только его карточку."""
+        other = Post.objects.create(author=self.user, text='Другой пост')
+        self.authorized_client.get(reverse('posts:index'))
+        cached_other = cache.get(card_key(other, True, True))
+        self.assertIn('Другой пост', cached_other)
+        post = Post.objects.get(pk=self.posts.pk)
+        post.text = 'Исправленный текст'
+        post.save()
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Исправленный текст')
+        self.assertEqual(cache.get(card_key(other, True, True)), cached_other)
+
+    def test_author_rename_refreshes_cards(self):
+        """Новое имя автора видно в ленте и группе без правки постов."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+        )
+        # Гость: в шапке у автора было бы его собственное имя.
+        guest_client = Client()
+        for url in urls:
+            guest_client.get(url)
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'Переименованный'
+        user.save()
+        for url in urls:
+            with self.subTest(url=url):
+                response = guest_client.get(url)
+                self.assertContains(response, 'Переименованный')
+
+    def test_group_rename_refreshes_cards(self):
+        """Новое название группы видно в карточках ленты."""
+        guest_client = Client()
+        guest_client.get(reverse('posts:index'))
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
+        response = guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Все записи группы Новое название')
+
+    def test_login_does_not_invalidate_pages(self):
+        """Сохранение одного last_login не сбрасывает кеш страниц."""
+        versions = get_versions('posts', f'author_cards:{self.user.pk}')
+        user = User.objects.get(pk=self.user.pk)
+        user.last_login = timezone.now()
+        user.save(update_fields=['last_login'])
+        self.assertEqual(
+            get_versions('posts', f'author_cards:{self.user.pk}'), versions
+        )
+
 
 class ContextPaginatorViewsTest(TestCase):
     @classmethod
@@ -172,6 +278,27 @@ class ContextPaginatorViewsTest(TestCase):
                 response = self.authorized_client.get(reverse_name + '?page=2')
                 self.assertEqual(len(response.context['page_obj']), 3)
 
+    def test_count_is_cached_until_post_saved(self):
+        """COUNT(*) ленты кешируется и сбрасывается новым постом."""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.authorized_client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(url + '?page=2')
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries.captured_queries)
+        )
+        Post.objects.create(author=self.user, text='Ещё', group=self.group)
+        response = self.authorized_client.get(url)
+        self.assertEqual(response.context['page_obj'].paginator.count, 14)
+
+    def test_page_window_is_bounded(self):
+        """Номера страниц показываются окном вокруг текущей."""
+        paginator = CachedCountPaginator(list(range(200)), 10)
+        self.assertEqual(
+            list(paginator.get_elided_page_range(10)),
+            [1, '…', 8, 9, 10, 11, 12, '…', 20],
+        )
+
     def test_post_form_correct_context(self):
         """Проверка корректности ожидаемого контекста форм"""
         post_id = ContextPaginatorViewsTest.posts[0].pk
@@ -242,3 +369,289 @@ class FollowViewsTest(TestCase):
         response = self.author_client.get(
             reverse('posts:follow_index'))
         self.assertIn(post, response.context['page_obj'].object_list)
+
+    def test_feed_inbox_follows_subscriptions(self):
+        """Лента подписок заполняется при записи и чистится при отписке."""
+        follow = Follow.objects.create(
+            user=self.post_follower,
+            author=self.post_autor)
+        post = Post.objects.create(
+            author=self.post_autor,
+            text='Новый пост')
+        self.assertTrue(
+            FeedItem.objects.filter(
+                user=self.post_follower, post=post).exists())
+        self.assertEqual(
+            FeedItem.objects.filter(user=self.post_follower).count(), 2)
+        follow.delete()
+        self.assertFalse(
+            FeedItem.objects.filter(user=self.post_follower).exists())
+
+    @override_settings(FEED_CELEBRITY_THRESHOLD=1)
+    def test_celebrity_posts_merged_on_read(self):
+        """Посты популярных авторов подмешиваются в ленту при чтении."""
+        Follow.objects.create(
+            user=self.post_follower,
+            author=self.post_autor)
+        cache.clear()
+        post = Post.objects.create(
+            author=self.post_autor,
+            text='Пост звезды')
+        self.assertFalse(FeedItem.objects.filter(post=post).exists())
+        response = self.author_client.get(
+            reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [post, self.post])
+
+    @override_settings(FEED_CELEBRITY_THRESHOLD=2)
+    def test_numbered_follow_pages(self):
+        """Номерные страницы ленты со «звездой» режет и считает БД."""
+        star = User.objects.create(username='Star')
+        Follow.objects.create(user=self.post_autor, author=star)
+        Follow.objects.create(user=self.post_follower, author=star)
+        Follow.objects.create(user=self.post_follower, author=self.post_autor)
+        self.assertTrue(feed.is_celebrity(star.pk))
+        for number in range(12):
+            Post.objects.create(
+                author=star if number % 2 else self.post_autor,
+                text=f'Пост {number}')
+        expected = list(
+            Post.objects.filter(author__in=(star, self.post_autor))
+            .order_by('-pub_date', '-id')[10:]
+        )
+        url = reverse('posts:follow_index') + '?page=2'
+        self.author_client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = self.author_client.get(url)
+        self.assertEqual(list(response.context['page_obj']), expected)
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] for query in context.captured_queries
+        ))
+
+    @override_settings(
+        FEED_CELEBRITY_THRESHOLD=3, FEED_CELEBRITY_DEMOTE_THRESHOLD=2
+    )
+    def test_celebrity_posts_kept_below_threshold(self):
+        """Уход ниже нижнего порога не теряет посты «звезды»."""
+        others = [
+            User.objects.create(username=f'Other_{number}')
+            for number in range(2)
+        ]
+        for other in others:
+            Follow.objects.create(user=other, author=self.post_autor)
+        follow = Follow.objects.create(
+            user=self.post_follower, author=self.post_autor)
+        post = Post.objects.create(
+            author=self.post_autor,
+            text='Пост звезды')
+        self.assertFalse(FeedItem.objects.filter(post=post).exists())
+        # Между порогами и в самой отписке ничего не перекладывается.
+        Follow.objects.filter(user=others[0]).delete()
+        Follow.objects.filter(user=others[1]).delete()
+        self.assertTrue(feed.is_celebrity(self.post_autor.pk))
+        self.assertFalse(FeedItem.objects.filter(post=post).exists())
+        call_command('demote_celebrities', stdout=StringIO())
+        self.assertFalse(feed.is_celebrity(self.post_autor.pk))
+        self.assertTrue(
+            FeedItem.objects.filter(
+                user=self.post_follower, post=post).exists())
+        response = self.author_client.get(
+            reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [post, self.post])
+        newer = Post.objects.create(
+            author=self.post_autor,
+            text='Снова в ленту')
+        self.assertTrue(
+            FeedItem.objects.filter(user=follow.user, post=newer).exists())
+
+    @override_settings(
+        FEED_CELEBRITY_THRESHOLD=3, FEED_CELEBRITY_DEMOTE_THRESHOLD=2
+    )
+    def test_celebrity_kept_between_thresholds(self):
+        """Между порогами автор остаётся «звездой»."""
+        others = [
+            User.objects.create(username=f'Other_{number}')
+            for number in range(3)
+        ]
+        for other in others:
+            Follow.objects.create(user=other, author=self.post_autor)
+        Follow.objects.filter(user=others[0]).delete()
+        call_command('demote_celebrities', stdout=StringIO())
+        self.assertTrue(feed.is_celebrity(self.post_autor.pk))
+
+    @override_settings(
+        FEED_CELEBRITY_THRESHOLD=1, FEED_CELEBRITY_DEMOTE_THRESHOLD=1,
+        FEED_DEMOTE_POSTS=2,
+    )
+    def test_demote_backfills_recent_posts(self):
+        """При возврате раскладываются только последние посты."""
+        follow = Follow.objects.create(
+            user=self.post_follower, author=self.post_autor)
+        posts = [
+            Post.objects.create(author=self.post_autor, text=f'Пост {number}')
+            for number in range(3)
+        ]
+        follow.delete()
+        Follow.objects.create(user=self.post_follower, author=self.post_autor)
+        UserStats.objects.filter(user=self.post_autor).update(
+            followers_count=0)
+        self.assertTrue(feed.demote(self.post_autor.pk))
+        self.assertEqual(
+            set(FeedItem.objects.filter(user=self.post_follower).values_list(
+                'post_id', flat=True)),
+            {posts[2].pk, posts[1].pk},
+        )
+
+
+class KeysetPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Test_Author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='tests_lug',
+            description='Тестовое описание',
+        )
+        for i in range(13):
+            Post.objects.create(
+                author=cls.user,
+                text=f'Тестовый текст {i}',
+                group=cls.group,
+            )
+        cls.ordered = list(Post.objects.order_by('-pub_date', '-id'))
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def test_cursor_pages_cover_feed(self):
+        """Курсоры «после» и «до» листают ленту без пропусков."""
+        for reverse_name in (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+        ):
+            with self.subTest(reverse_name=reverse_name):
+                first = self.guest_client.get(reverse_name).context['page_obj']
+                response = self.guest_client.get(
+                    reverse_name + '?after=' + first.next_cursor
+                )
+                second = response.context['page_obj']
+                self.assertEqual(list(second), self.ordered[10:])
+                self.assertFalse(second.has_next())
+                response = self.guest_client.get(
+                    reverse_name + '?before=' + second.previous_cursor
+                )
+                self.assertEqual(
+                    list(response.context['page_obj']), self.ordered[:10]
+                )
+
+    def test_broken_cursor_shows_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        response = self.guest_client.get(reverse('posts:index') + '?after=!!')
+        self.assertEqual(
+            list(response.context['page_obj']), self.ordered[:10]
+        )
+
+
+@override_settings(COMMENTS_PER_PAGE=20)
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.post = Post.objects.create(
+            author=User.objects.create_user(username='Test_Author'),
+            text='Тестовый пост',
+        )
+        for i in range(25):
+            Comment.objects.create(
+                post=cls.post,
+                author=User.objects.create_user(username=f'reader_{i}'),
+                text=f'Комментарий {i}',
+            )
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def test_comments_loaded_in_batches(self):
+        """Комментарии грузятся пачками вместе с авторами."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 20)
+        self.assertLess(len(queries.captured_queries), 10)
+        response = self.guest_client.get(
+            reverse('posts:comments', kwargs={'post_id': self.post.pk})
+            + '?after=' + comments.next_cursor
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertEqual(len(response.context['comments']), 5)
+        self.assertContains(response, 'Комментарий 0')
+        self.assertNotContains(response, 'Показать ещё')
+
+    def test_more_comments_link(self):
+        """«Показать ещё» без скрипта открывает пост со следующей пачкой,
+        а скрипт берёт ту же пачку фрагментом."""
+        detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        )
+        fragment_url = reverse(
+            'posts:comments', kwargs={'post_id': self.post.pk}
+        )
+        response = self.guest_client.get(detail_url)
+        link, fragment = (
+            url.replace('&amp;', '&') for url in re.search(
+                r'href="([^"]+)"\s+data-fragment="([^"]+)">Показать ещё',
+                response.content.decode(),
+            ).groups()
+        )
+        self.assertTrue(link.startswith(f'{detail_url}?after='))
+        self.assertTrue(fragment.startswith(f'{fragment_url}?after='))
+        response = self.guest_client.get(link)
+        self.assertTemplateUsed(response, 'posts/post_detail.html')
+        self.assertEqual(len(response.context['comments']), 5)
+        response = self.guest_client.get(
+            fragment, HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        self.assertTemplateNotUsed(response, 'posts/post_detail.html')
+        self.assertEqual(len(response.context['comments']), 5)
+        self.assertNotContains(response, 'Тестовый пост')
+
+
+class NPlusOneViewsTest(NPlusOneTestMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        for i in range(5):
+            author = User.objects.create_user(username=f'author_{i}')
+            group = Group.objects.create(
+                title=f'Группа {i}', slug=f'group_{i}', description='-'
+            )
+            cls.post = Post.objects.create(
+                author=author, group=group, text=f'Пост {i}'
+            )
+            Comment.objects.create(
+                post=cls.post, author=author, text=f'Комментарий {i}'
+            )
+            Follow.objects.create(user=cls.reader, author=author)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+        cache.clear()
+
+    def test_pages_without_nplusone(self):
+        """Авторы, группы и комментарии не подгружаются по одному."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+        for url in urls:
+            with self.subTest(url=url), self.assertNoNPlusOne():
+                self.authorized_client.get(url)
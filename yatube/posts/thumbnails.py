@@ -0,0 +1,340 @@
+"""Нарезка превью картинок постов вне запроса.
+
+Все размеры, которые используют шаблоны, описаны в POST_THUMBNAILS.
+После сохранения поста они нарезаются в пуле процессов, а готовые
+адреса кладутся в кеш, откуда их читает тег thumbnail_url. Там же
+рядом с исходником сохраняются адаптивные варианты для srcset.
+Размеры, цвет и заглушка считаются ещё при загрузке и хранятся в посте.
+"""
+from base64 import b64encode
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from hashlib import md5
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+from PIL.ExifTags import TAGS
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+URLS_KEY = 'thumbnail_urls:{}'
+# Сторона заглушки: браузер растягивает её, и она выглядит размытой.
+PLACEHOLDER_SIZE = 16
+ORIENTATION = next(tag for tag, name in TAGS.items() if name == 'Orientation')
+# Значения поля картинки, когда её нет, и сброс вариантов старой.
+NO_METADATA = {
+    'image_width': None,
+    'image_height': None,
+    'image_color': '',
+    'image_placeholder': '',
+    'image_widths': '',
+}
+
+_executor = None
+
+
+def urls_key(name):
+    return URLS_KEY.format(md5(name.encode()).hexdigest())
+
+
+def thumbnail_size(alias):
+    geometry = settings.POST_THUMBNAILS[alias][0]
+    width, height = (int(side) for side in geometry.split('x'))
+    return width, height
+
+
+def display_size(post, alias, url):
+    """Размеры <img> под адрес url: превью alias или сам исходник.
+
+    Пока превью не готово, отдаётся исходник, и размеры берутся
+    из посчитанных при загрузке — браузер сохранит его пропорции.
+    """
+    if url == post.image.url and post.image_width and post.image_height:
+        return post.image_width, post.image_height
+    return thumbnail_size(alias)
+
+
+def describe(upload):
+    """Метаданные загруженной картинки для полей поста.
+
+    Размеры берутся из заголовка с учётом поворота по EXIF, а цвет
+    и заглушка — из уменьшенного через draft растра.
+    """
+    upload.seek(0)
+    with Image.open(upload) as image:
+        width, height = image.size
+        if image.getexif().get(ORIENTATION) in (5, 6, 7, 8):
+            width, height = height, width
+        image.draft('RGB', (PLACEHOLDER_SIZE * 8, PLACEHOLDER_SIZE * 8))
+        small = ImageOps.exif_transpose(image).convert('RGB')
+    upload.seek(0)
+    small.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    color = small.resize((1, 1), Image.BOX).getpixel((0, 0))
+    buffer = BytesIO()
+    small.save(buffer, 'JPEG', quality=60)
+    return dict(
+        NO_METADATA,
+        image_width=width,
+        image_height=height,
+        image_color='#{:02x}{:02x}{:02x}'.format(*color),
+        image_placeholder='data:image/jpeg;base64,{}'.format(
+            b64encode(buffer.getvalue()).decode()
+        ),
+    )
+
+
+def thumbnail(image, alias):
+    geometry, options = settings.POST_THUMBNAILS[alias]
+    return get_thumbnail(image, geometry, **options)
+
+
+def thumbnail_file(image, alias):
+    """Файл превью, как его назовёт sorl, без чтения исходника.
+
+    Повторяет сборку опций из get_thumbnail, поэтому его ключ совпадает
+    с ключом, под которым sorl сохранит превью.
+    """
+    geometry, options = settings.POST_THUMBNAILS[alias]
+    options = dict(options)
+    backend = default.backend
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(ImageFile(image), geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def thumbnail_key(image, alias):
+    """Ключ записи о превью в хранилище sorl."""
+    return thumbnail_file(image, alias).key
+
+
+def prefetch(images):
+    """Готовит адреса превью целой страницы за пару пакетных чтений.
+
+    Адреса из кеша одним get_many прикрепляются к файлам, а для
+    недостающих размеров записи sorl выбираются одним запросом —
+    нарезка остаётся только для настоящих промахов.
+    """
+    images = [image for image in images if image]
+    if not images:
+        return
+    urls = cache.get_many([urls_key(image.name) for image in images])
+    keys = []
+    for image in images:
+        image.thumbnail_urls = urls.get(urls_key(image.name), {})
+        keys.extend(
+            thumbnail_key(image, alias) for alias in settings.POST_THUMBNAILS
+            if alias not in image.thumbnail_urls
+        )
+    # С форматом исходника ключ не вычислить без чтения файла, а чужое
+    # хранилище может не уметь пакетную выборку.
+    if (keys and not sorl_settings.THUMBNAIL_PRESERVE_FORMAT
+            and hasattr(default.kvstore, 'prefetch')):
+        default.kvstore.prefetch(keys)
+
+
+def generate(name):
+    """Нарезает все превью исходника name и возвращает их адреса."""
+    return {
+        alias: thumbnail(name, alias).url for alias in settings.POST_THUMBNAILS
+    }
+
+
+def variant_name(name, width, extension):
+    root, _ = os.path.splitext(name)
+    return f'{root}_{width}w.{extension}'
+
+
+def make_variants(name):
+    """Сохраняет кадр карточки в нескольких ширинах и форматах.
+
+    Варианты лежат рядом с исходником; возвращаются ширины, которые
+    не требуют увеличения картинки (но хотя бы самая узкая).
+    """
+    card_width, card_height = thumbnail_size('card')
+    with default_storage.open(name) as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    widths = [
+        width for width in settings.POST_IMAGE_WIDTHS if width <= image.width
+    ] or list(settings.POST_IMAGE_WIDTHS[:1])
+    for width in widths:
+        size = (width, round(width * card_height / card_width))
+        variant = ImageOps.fit(image, size, Image.LANCZOS)
+        for extension, image_format in settings.POST_IMAGE_FORMATS.items():
+            buffer = BytesIO()
+            variant.save(
+                buffer, image_format, quality=settings.POST_IMAGE_QUALITY
+            )
+            path = variant_name(name, width, extension)
+            if default_storage.exists(path):
+                default_storage.delete(path)
+            default_storage.save(path, ContentFile(buffer.getvalue()))
+    return widths
+
+
+def record_variants(post_id, name, widths):
+    """Запоминает ширины в посте, если картинка в нём всё ещё name.
+
+    Сохранение обновляет дату изменения и шлёт сигналы, поэтому кеши
+    карточки и страниц сбрасываются, и srcset появляется сразу. Зовётся
+    в процессе сайта, а не в воркере нарезки: версии кеша, поднятые
+    сигналами в воркере, остались бы в его собственном кеше.
+    """
+    # Модуль распаковывается в воркере до django.setup(), поэтому
+    # модели импортируются только при вызове.
+    from .models import Post
+    post = Post.objects.select_related('author', 'group').filter(
+        pk=post_id
+    ).first()
+    # Пока шла нарезка, пост могли удалить или сменить в нём картинку.
+    if post is None or post.image.name != name:
+        return
+    post.image_widths = ','.join(str(width) for width in widths)
+    post.save(update_fields=['image_widths', 'updated'])
+
+
+def render(name):
+    """Нарезает превью и варианты; возвращает адреса и ширины.
+
+    Только работа с файлами: записи в БД и кеш делает _save.
+    """
+    started = time.perf_counter()
+    urls = generate(name)
+    widths = make_variants(name)
+    metrics.THUMBNAIL_SECONDS.observe(time.perf_counter() - started)
+    return urls, widths
+
+
+def image_sources(post):
+    """Источники для <picture>: строка srcset на каждый формат."""
+    if not post.image or not post.image_widths:
+        return []
+    storage = post.image.storage
+    widths = post.image_widths.split(',')
+    return [
+        {
+            'type': f'image/{image_format.lower()}',
+            'srcset': ', '.join(
+                '{} {}w'.format(storage.url(
+                    variant_name(post.image.name, width, extension)
+                ), width)
+                for width in widths
+            ),
+        }
+        for extension, image_format in settings.POST_IMAGE_FORMATS.items()
+    ]
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # spawn, а не fork: воркеру не достаются открытые соединения
+        # с БД и блокировки потоков родителя.
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.POST_THUMBNAIL_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+        )
+    return _executor
+
+
+def _save(post_id, name, urls, widths):
+    record_variants(post_id, name, widths)
+    cache.set(urls_key(name), urls, settings.POST_CARD_CACHE_TIMEOUT)
+
+
+def _store(post_id, name, future):
+    # Колбэк выполняется в потоке родителя, а не в воркере.
+    try:
+        _save(post_id, name, *future.result())
+    except Exception:
+        logger.exception('Не удалось нарезать превью %s', name)
+    finally:
+        # Поток пула живёт долго: соединение с БД ему держать незачем.
+        connection.close()
+
+
+def _reset_executor():
+    """Бросает пул с погибшим воркером: новые задачи он уже не примет."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+
+def _submit_to_pool(post_id, name):
+    try:
+        future = _get_executor().submit(render, name)
+    except BrokenProcessPool:
+        # Воркер мог погибнуть, например, от нехватки памяти на большой
+        # картинке; пул пересоздаётся один раз на задачу.
+        logger.warning('Пул нарезки превью сломан, создаётся заново')
+        _reset_executor()
+        future = _get_executor().submit(render, name)
+    future.add_done_callback(partial(_store, post_id, name))
+
+
+def _submit(post_id, name):
+    # Зовётся из on_commit, а вне транзакции — прямо в представлении:
+    # пост уже сохранён, и ошибка нарезки не должна стать ответом 500.
+    # Без превью шаблоны показывают исходник.
+    try:
+        if settings.POST_THUMBNAIL_WORKERS:
+            _submit_to_pool(post_id, name)
+        else:
+            _save(post_id, name, *render(name))
+    except Exception:
+        logger.exception('Не удалось поставить нарезку превью %s', name)
+
+
+def schedule(post):
+    """Ставит нарезку превью поста в очередь после коммита транзакции."""
+    if post.image:
+        transaction.on_commit(partial(_submit, post.pk, post.image.name))
+
+
+def thumbnail_url(image, alias):
+    """Адрес превью без нарезки в запросе.
+
+    Сначала адреса из кеша, затем запись sorl о готовом превью; пока
+    превью нет, отдаётся исходник с его размерами (см. display_size).
+    """
+    if not image:
+        return ''
+    urls = getattr(image, 'thumbnail_urls', None)
+    if urls is None:
+        urls = cache.get(urls_key(image.name))
+    if urls and alias in urls:
+        return urls[alias]
+    # С форматом исходника имя превью не вычислить без чтения файла.
+    if not sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        ready = default.kvstore.get(thumbnail_file(image, alias))
+        if ready is not None:
+            return ready.url
+    return image.url
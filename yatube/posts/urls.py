@@ -9,6 +9,10 @@ urlpatterns = [
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='edit'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('posts/<int:post_id>/comments/',
+         views.post_comments,
+         name='comments'
+         ),
     path('posts/<int:post_id>/comment/',
          views.add_comment,
          name='add_comment'
@@ -16,6 +20,12 @@ urlpatterns = [
     path('create/', views.post_create, name='create'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
+    path('tags/<str:name>/', views.tag_posts, name='tag_list'),
+    path('profile/<str:username>/mentions/',
+         views.mentions,
+         name='mentions'
+         ),
     path('profile/<str:username>/follow/',
          views.profile_follow,
          name='profile_follow'
@@ -1,9 +1,218 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+from hashlib import md5
+
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from .cache import get_version
+
+CURSOR_SEPARATOR = '|'
+COUNT_SCOPE = 'paginator_count'
+
+
+def encode_cursor(values):
+    """Упаковывает значения ключа сортировки в непрозрачный токен."""
+    raw = CURSOR_SEPARATOR.join(str(value) for value in values)
+    return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен обратно в список строковых значений."""
+    padding = '=' * (-len(token) % 4)
+    try:
+        raw = urlsafe_b64decode(token + padding).decode()
+    except (Base64Error, UnicodeDecodeError, ValueError):
+        return None
+    return raw.split(CURSOR_SEPARATOR)
+
+
+def keyset_rows(queryset, keys, values, lookup, limit):
+    """Выбирает до limit записей строго за курсором values.
+
+    lookup 'lt' идёт вглубь ленты (по убыванию ключа), 'gt' — обратно
+    к её началу (по возрастанию). Без курсора выбирается начало ленты.
+    """
+    if values:
+        (first, second), (first_value, second_value) = keys, values
+        # Нестрогое условие по первому ключу даёт планировщику
+        # диапазонный просмотр индекса, второе отсекает уже показанное.
+        queryset = queryset.filter(
+            Q(**{f'{first}__{lookup}e': first_value})
+            & (Q(**{f'{first}__{lookup}': first_value})
+               | Q(**{f'{second}__{lookup}': second_value}))
+        )
+    ordering = keys if lookup == 'gt' else [f'-{key}' for key in keys]
+    return list(queryset.order_by(*ordering)[:limit])
+
+
+class KeysetPage(Page):
+    """Страница курсорной пагинации: без номера и общего количества."""
+
+    def __init__(self, object_list, paginator, has_next=False,
+                 has_previous=False):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.next_cursor = (
+            paginator.cursor_for(object_list[-1])
+            if has_next and object_list else None
+        )
+        self.previous_cursor = (
+            paginator.cursor_for(object_list[0])
+            if has_previous and object_list else None
+        )
+
+    def __repr__(self):
+        return '<KeysetPage %s>' % self.next_cursor
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def next_page_number(self):
+        return None
+
+    def previous_page_number(self):
+        return None
+
+
+class KeysetPaginator(Paginator):
+    """Пагинатор по ключу (pub_date, id).
+
+    Вместо LIMIT/OFFSET и COUNT(*) выбирает записи строго до или после
+    курсора, поэтому глубокие страницы стоят столько же, сколько первая.
+    """
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'id')):
+        super().__init__(object_list, per_page)
+        self.keys = keys
+
+    def cursor_for(self, obj):
+        return encode_cursor(getattr(obj, key) for key in self.keys)
+
+    def parse_cursor(self, token):
+        values = decode_cursor(token) if token else None
+        if not values or len(values) != len(self.keys):
+            return None
+        parse = getattr(self.object_list, 'parse_values', None)
+        if parse is not None:
+            # Источник с вычисляемыми ключами сам знает их типы.
+            try:
+                return parse(values)
+            except ValueError:
+                return None
+        opts = self.object_list.model._meta
+        try:
+            return [
+                opts.get_field(key).to_python(value)
+                for key, value in zip(self.keys, values)
+            ]
+        except ValidationError:
+            return None
+
+    def _fetch(self, values, lookup):
+        fetch = getattr(self.object_list, 'keyset_rows', None)
+        if fetch is not None:
+            return fetch(values, lookup, self.per_page + 1)
+        return keyset_rows(
+            self.object_list, self.keys, values, lookup, self.per_page + 1
+        )
+
+    def get_page(self, after=None, before=None):
+        """Возвращает страницу после или до курсора.
+
+        Битый курсор не считается ошибкой: показывается первая страница.
+        """
+        after_values = self.parse_cursor(after)
+        before_values = self.parse_cursor(before)
+        if before_values and not after_values:
+            rows = self._fetch(before_values, 'gt')
+            return KeysetPage(
+                rows[:self.per_page][::-1], self,
+                has_next=True, has_previous=len(rows) > self.per_page,
+            )
+        rows = self._fetch(after_values, 'lt')
+        return KeysetPage(
+            rows[:self.per_page], self,
+            has_next=len(rows) > self.per_page,
+            has_previous=bool(after_values),
+        )
+
+
+class CachedCountPaginator(Paginator):
+    """Пагинатор с кешированным COUNT(*) и окном номеров страниц.
+
+    Количество хранится по сигнатуре SQL-запроса и сбрасывается сигналами
+    при записи постов и подписок.
+    """
+    ELLIPSIS = '…'
+
+    @cached_property
+    def count(self):
+        # Источник не из одного запроса сам называет, что он считает.
+        signature = getattr(self.object_list, 'count_signature', None)
+        if signature is None:
+            query = getattr(self.object_list, 'query', None)
+            if query is None:
+                return super().count
+            signature = str(query)
+        key = 'paginator_count:{}:{}'.format(
+            get_version(COUNT_SCOPE), md5(signature.encode()).hexdigest()
+        )
+        count = cache.get(key)
+        if count is None:
+            count = self.object_list.count()
+            cache.set(key, count, settings.PAGINATOR_COUNT_TIMEOUT)
+        return count
+
+    def get_elided_page_range(self, number=1, on_each_side=2, on_ends=1):
+        """Номера страниц вокруг текущей и по краям, остальное — ELLIPSIS."""
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > on_each_side + on_ends + 2:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < self.num_pages - on_each_side - on_ends - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(self.num_pages - on_ends + 1, self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
 
 
-def paginate(request, data_list):
-    paginator = Paginator(data_list, settings.NUMBER_POST)
+def paginate(request, data_list, keys=('pub_date', 'id')):
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if after or before:
+        paginator = KeysetPaginator(data_list, settings.NUMBER_POST, keys)
+        return paginator.get_page(after=after, before=before)
+    paginator = CachedCountPaginator(data_list, settings.NUMBER_POST)
     page_number = request.GET.get("page")
     page_obj = paginator.get_page(page_number)
+    page_obj.page_window = list(paginator.get_elided_page_range(
+        page_obj.number,
+        on_each_side=settings.PAGINATOR_ON_EACH_SIDE,
+        on_ends=settings.PAGINATOR_ON_ENDS,
+    ))
+    # Ссылки «вперёд/назад» с обычной страницы сразу ведут в курсорный
+    # режим, чтобы листание вглубь не упиралось в OFFSET.
+    cursors = KeysetPaginator(data_list, settings.NUMBER_POST, keys)
+    page_obj.next_cursor = (
+        cursors.cursor_for(page_obj[-1]) if page_obj.has_next() else None
+    )
+    page_obj.previous_cursor = (
+        cursors.cursor_for(page_obj[0]) if page_obj.has_previous() else None
+    )
     return page_obj
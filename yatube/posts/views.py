@@ -1,15 +1,40 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.db import connection
 from django.shortcuts import get_object_or_404, redirect, render
 from .forms import PostForm, CommentForm
-from .models import Group, Post, Follow
-from .utils import paginate
-from django.views.decorators.cache import cache_page
+from .feed import HybridFeed
+from .models import Comment, Group, Post, Follow, Tag
+from .search import SearchResults
+from .tags import IndexedPosts
+from .utils import KeysetPaginator, paginate
+from . import thumbnails
+from .cache import cache_page_versioned
 
 User = get_user_model()
 
 
-@cache_page(20, key_prefix='index_page')
+POST_AUTHOR_KEY = 'post_author:{}'
+
+
+def post_scopes(post_id):
+    # Автор поста не меняется, поэтому его id хранится в кеше без срока:
+    # попадание в кеш страницы обходится без запросов к БД.
+    key = POST_AUTHOR_KEY.format(post_id)
+    author_id = cache.get(key)
+    if author_id is None:
+        author_id = Post.objects.filter(pk=post_id).values_list(
+            'author_id', flat=True
+        ).first()
+        if author_id is None:
+            return [f'post:{post_id}']
+        cache.set(key, author_id, None)
+    return [f'post:{post_id}', f'author:{author_id}']
+
+
+@cache_page_versioned('index_page', lambda: ['posts'])
 def index(request):
     template = 'posts/index.html'
     post_list = Post.objects.select_related('group', 'author')
@@ -20,6 +45,7 @@ def index(request):
     return render(request, template, context)
 
 
+@cache_page_versioned('group_page', lambda slug: [f'group:{slug}'])
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
@@ -29,48 +55,68 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@cache_page_versioned(
+    'profile_page', lambda username: [f'profile:{username}']
+)
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
     post_list = author.posts.select_related('group', 'author')
     page_obj = paginate(request, post_list)
-    following = False
-    if request.user.is_authenticated and request.user != author:
-        if Follow.objects.filter(user=request.user, author=author).exists():
-            following = "can_unfollow"
-        else:
-            following = "can_follow"
     context = {'page_obj': page_obj,
                'author': author,
-               'following': following,
                }
     return render(request, template, context)
 
 
+@cache_page_versioned('post_page', post_scopes)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
     form = CommentForm()
-    comments = post.comments.all()
     context = {
         'post': post,
         'form': form,
-        'comments': comments,
+        'comments': comments_page(request, post.pk),
     }
     return render(request, template, context)
 
 
+def comments_page(request, post_id):
+    comments = KeysetPaginator(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        settings.COMMENTS_PER_PAGE,
+        keys=('created', 'id'),
+    )
+    return comments.get_page(after=request.GET.get('after'))
+
+
+@cache_page_versioned('comments_page', lambda post_id: [f'post:{post_id}'])
+def post_comments(request, post_id):
+    """Следующая пачка комментариев без перерисовки самого поста."""
+    template = 'posts/includes/comments.html'
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    context = {'post': post, 'comments': comments_page(request, post_id)}
+    return render(request, template, context)
+
+
 @login_required
 def post_create(request):
     template = 'posts/create_post.html'
     form = PostForm(
         request.POST or None,
-        files=request.FILES or None
+        files=request.FILES or None,
+        upload_errors=getattr(request, 'upload_errors', None)
     )
     if form.is_valid():
         create_post = form.save(commit=False)
         create_post.author = request.user
         create_post.save()
+        thumbnails.schedule(create_post)
         return redirect('posts:profile', create_post.author)
     context = {'form': form}
     return render(request, template, context)
@@ -85,10 +131,13 @@ def post_edit(request, post_id):
     form = PostForm(
         request.POST or None,
         files=request.FILES or None,
+        upload_errors=getattr(request, 'upload_errors', None),
         instance=edit_post
     )
     if form.is_valid():
         form.save()
+        if 'image' in form.changed_data:
+            thumbnails.schedule(edit_post)
         return redirect('posts:post_detail', post_id)
     context = {'form': form, 'is_edit': True}
     return render(request, template, context)
@@ -110,9 +159,9 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     template = 'posts/follow.html'
-    post_list = Post.objects.filter(author__following__user=request.user)
-    no_follow = post_list.exists()
-    page_obj = paginate(request, post_list)
+    feed = HybridFeed(request.user)
+    no_follow = feed.exists()
+    page_obj = paginate(request, feed)
     context = {
         'page_obj': page_obj,
         'no_follow': no_follow,
@@ -120,6 +169,41 @@ def follow_index(request):
     return render(request, template, context)
 
 
+def keyset_page(request, source, keys=('pub_date', 'id')):
+    paginator = KeysetPaginator(source, settings.NUMBER_POST, keys)
+    return paginator.get_page(
+        after=request.GET.get('after'), before=request.GET.get('before')
+    )
+
+
+@cache_page_versioned('tag_page', lambda name: ['posts'])
+def tag_posts(request, name):
+    template = 'posts/tag_list.html'
+    tag = get_object_or_404(Tag, name=name.lower())
+    page_obj = keyset_page(request, IndexedPosts(tag.post_tags.all()))
+    context = {'title': str(tag), 'page_obj': page_obj}
+    return render(request, template, context)
+
+
+@cache_page_versioned('mentions_page', lambda username: ['posts'])
+def mentions(request, username):
+    template = 'posts/tag_list.html'
+    user = get_object_or_404(User, username=username)
+    page_obj = keyset_page(request, IndexedPosts(user.mentions.all()))
+    context = {'title': f'Упоминания @{user.username}', 'page_obj': page_obj}
+    return render(request, template, context)
+
+
+def search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    page_obj = keyset_page(
+        request, SearchResults(query, connection), keys=('rank', 'id')
+    )
+    context = {'query': query, 'page_obj': page_obj}
+    return render(request, template, context)
+
+
 @login_required
 def profile_follow(request, username):
     template = 'posts:profile'
@@ -64,6 +64,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.timing.ServerTimingMiddleware',
+    'core.middleware.nplusone.NPlusOneMiddleware',
+    'core.middleware.metrics.MetricsMiddleware',
+    'core.middleware.profiling.SamplingProfilerMiddleware',
+    'core.middleware.memory.MemoryProfileMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -71,6 +76,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.holes.HolePunchMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -92,11 +98,25 @@ TEMPLATES = [
     },
 ]
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# версии в ключах кеша поднимаются сигналами в процессе, где была запись;
+# у LocMemCache свой кеш на процесс, и остальные воркеры увидят изменение
+# только по истечении TTL, поэтому длинные TTL — лишь с общим memcached
+# (MEMCACHED_LOCATION — адреса через запятую)
+MEMCACHED_LOCATION = os.environ.get('MEMCACHED_LOCATION', '')
+SHARED_CACHE = bool(MEMCACHED_LOCATION)
+if SHARED_CACHE:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': MEMCACHED_LOCATION.split(','),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
     }
-}
 
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
@@ -163,7 +183,138 @@ POST_MIN_LEN = 1
 
 NUMBER_POST = 10
 
+COMMENTS_PER_PAGE = 20
+
+# сколько секунд хранить COUNT(*) ленты и сколько номеров страниц показывать
+PAGINATOR_COUNT_TIMEOUT = 60 * 60 if SHARED_CACHE else 20
+
+PAGINATOR_ON_EACH_SIDE = 2
+
+PAGINATOR_ON_ENDS = 1
+
+# размер пачки при раскладке постов по лентам подписчиков
+FEED_BATCH_SIZE = 1000
+
+# с какого числа подписчиков посты автора читаются на лету, а не
+# раскладываются по лентам; переход отмечается в UserStats.celebrity
+FEED_CELEBRITY_THRESHOLD = 10000
+
+# обратно к раскладке — ниже этого числа и только командой
+# demote_celebrities, которая разложит FEED_DEMOTE_POSTS последних постов
+FEED_CELEBRITY_DEMOTE_THRESHOLD = 9000
+
+FEED_DEMOTE_POSTS = 100
+
+# страницы сбрасываются сигналами записи, TTL лишь ограничивает старые
+# копии; без общего кеша он же ограничивает, сколько другие процессы
+# показывают устаревшее (см. CACHES)
+PAGE_CACHE_TIMEOUT = 24 * 60 * 60 if SHARED_CACHE else 20
+
+# карточки постов версионируются временем изменения поста, а имена
+# автора и группы — версиями в кеше, поэтому TTL тоже зависит от CACHES
+POST_CARD_CACHE_TIMEOUT = 7 * 24 * 60 * 60 if SHARED_CACHE else 20
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# все размеры превью, которые используют шаблоны: имя -> (геометрия, опции)
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+
+# ширины адаптивных вариантов картинки поста и их форматы: расширение -> Pillow
+POST_IMAGE_WIDTHS = (320, 640, 960)
+POST_IMAGE_FORMATS = {'webp': 'WEBP', 'jpg': 'JPEG'}
+POST_IMAGE_QUALITY = 80
+
+# лимиты загрузки картинок: размер файла и число пикселей по заголовку
+IMAGE_UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+IMAGE_UPLOAD_MAX_PIXELS = 40 * 1000 * 1000
+
+# оригиналы больше этой стороны уменьшаются при загрузке
+POST_IMAGE_MAX_SIDE = 2560
+
+FILE_UPLOAD_HANDLERS = [
+    'core.uploadhandlers.BoundedImageUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# хранилище записей sorl с пакетной предвыборкой для страниц ленты
+THUMBNAIL_KVSTORE = 'posts.kvstore.KVStore'
+
+# процессы для нарезки превью вне запроса; 0 — нарезать сразу при сохранении
+POST_THUMBNAIL_WORKERS = 2
+
+# замеры SQL, шаблонов и кеша в заголовке Server-Timing и в логе;
+# выключенные не стоят ничего: middleware убирается из цепочки
+SERVER_TIMING = os.environ.get('SERVER_TIMING') == '1'
+
+# поиск N+1: 'log' — предупреждение в лог, 'raise' — ошибка, '' — выключен
+NPLUSONE_DETECT = os.environ.get('NPLUSONE_DETECT', '')
+# сколько одинаковых по форме SELECT в запросе считаются N+1
+NPLUSONE_THRESHOLD = 3
+
+# метрики для /metrics: каждый процесс пишет свой файл в METRICS_DIR,
+# страница складывает их; каталог очищается при деплое
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED') == '1'
+METRICS_DIR = os.environ.get(
+    'METRICS_DIR', os.path.join(BASE_DIR, 'metrics')
+)
+# доступ к /metrics: с заданным токеном сборщик присылает заголовок
+# «Authorization: Bearer <токен>»; без токена пускаются только адреса
+# METRICS_ALLOWED_IPS. За прокси REMOTE_ADDR всегда адрес самого прокси,
+# поэтому без токена /metrics нужно закрыть снаружи на прокси
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
+
+# выборочный профилировщик: каждый N-й запрос к PROFILE_URL_NAMES идёт
+# под cProfile и выборщиком стеков; 0 — выключен
+PROFILE_SAMPLE_RATE = int(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_URL_NAMES = ('posts:index', 'posts:follow_index')
+# куда пишутся pstats и свёрнутые стеки для flamegraph
+PROFILE_DIR = os.environ.get(
+    'PROFILE_DIR', os.path.join(BASE_DIR, 'profiles')
+)
+# период снятия стека, секунды
+PROFILE_INTERVAL = 0.001
+
+# tracemalloc вокруг представлений, перечисленных через запятую
+# в MEMORY_PROFILE, например posts:post_detail,posts:index; пусто — выключен
+MEMORY_PROFILE_URL_NAMES = tuple(
+    name for name in os.environ.get('MEMORY_PROFILE', '').split(',') if name
+)
+# куда кладутся снимки для manage.py memory_diff
+MEMORY_PROFILE_DIR = os.environ.get(
+    'MEMORY_PROFILE_DIR', os.path.join(BASE_DIR, 'memory')
+)
+# глубина стека у выделений и сколько мест показывать в логе
+MEMORY_PROFILE_FRAMES = 10
+MEMORY_PROFILE_TOP = 10
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.middleware.timing': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'core.middleware.nplusone': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'core.middleware.memory': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}